@@ -20,10 +20,11 @@ from _simpy.rt import RealtimeEnvironment
 from _simpy.exceptions import _simpyException, Interrupt, StopProcess
 from _simpy.events import Event, Timeout, Process, AllOf, AnyOf
 from _simpy.resources.resource import (
-    Resource, PriorityResource, PreemptiveResource)
+    Resource, PriorityResource, PreemptiveResource, MultiRequest)
 from _simpy.resources.container import Container
 from _simpy.resources.store import (
-    Store, PriorityItem, PriorityStore, FilterStore)
+    Store, PriorityItem, PriorityStore, FilterStore, KeyedStore, ArrayStore)
+from _simpy.monitor import Profiler, EventTrace, Sampler, ResourceMonitor
 
 
 def compile_toc(entries, section_marker='='):
@@ -46,8 +47,12 @@ toc = (
         Event, Timeout, Process, AllOf, AnyOf, Interrupt,
     )),
     ('Resources', (
-        Resource, PriorityResource, PreemptiveResource, Container, Store,
-        PriorityItem, PriorityStore, FilterStore,
+        Resource, PriorityResource, PreemptiveResource, MultiRequest,
+        Container, Store, PriorityItem, PriorityStore, FilterStore, KeyedStore,
+        ArrayStore,
+    )),
+    ('Monitoring', (
+        Profiler, EventTrace, Sampler, ResourceMonitor,
     )),
     ('Exceptions', (
         _simpyException, Interrupt, StopProcess,
@@ -5,9 +5,15 @@ _simpy-agents modifications:
 - added optional 'agent' parameter to `Environment.schedule()`
 - modified `Environment.step()` to accomodate the above change
 - added `Environment.scheduled_agents` property
+- added a per-agent index of live queue entries and `Environment.is_scheduled()`
+- added lazy removal of cancelled events (see `Event.cancel()`)
+- added step hooks (see `Environment.add_step_hook()`)
+- added scheduler counters (see `Environment.stats()`)
+- added `Environment._hold()` to count pending resource requests of agents
 """
 import types
-from heapq import heappush, heappop
+from time import perf_counter
+from heapq import heappush, heappop, heapify
 from itertools import count
 
 from _simpy.exceptions import StopProcess
@@ -170,11 +176,29 @@ class Environment(BaseEnvironment):
     :attr:`process`, :attr:`timeout` and :attr:`event`.
 
     """
+    compact_fraction = 0.5
+    """Fraction of cancelled entries in the event queue above which the queue
+    is rebuilt without them."""
+
+    compact_min_size = 64
+    """Minimum queue length before cancelled entries trigger a rebuild."""
+
     def __init__(self, initial_time=0):
         self._now = initial_time
         self._queue = []  # The list of all currently scheduled events.
         self._eid = count()  # Counter for event IDs
         self._active_proc = None
+        self._scheduled = {}  # Number of live queue entries per agent.
+        self._dead = 0  # Number of cancelled entries still in the queue.
+        self._step_hooks = []
+
+        # Scheduler counters, see stats().
+        self._initial_time = initial_time
+        self._processed = 0
+        self._cancelled_total = 0
+        self._peak = 0
+        self._wall = 0.0
+        self._run_start = None
 
         # Bind all BoundClass instances to "self" to improve performance.
         BoundClass.bind_early(self)
@@ -197,37 +221,210 @@ class Environment(BaseEnvironment):
 
     def schedule(self, event, priority=NORMAL, delay=0, agent=None):
         """Schedule an *event* with a given *priority* and a *delay*."""
-        heappush(self._queue,
+        queue = self._queue
+        heappush(queue,
                  (self._now + delay, priority, next(self._eid), event, agent))
+        if len(queue) - self._dead > self._peak:
+            self._peak = len(queue) - self._dead
+        if agent is not None:
+            scheduled = self._scheduled
+            scheduled[agent] = scheduled.get(agent, 0) + 1
+
+    def _hold(self, agent):
+        """Count a pending resource request of *agent* as a live entry in the
+        agent index. Released with :meth:`_unschedule`."""
+        scheduled = self._scheduled
+        scheduled[agent] = scheduled.get(agent, 0) + 1
+
+    def _unschedule(self, agent):
+        """Remove one live queue entry of *agent* from the agent index."""
+        remaining = self._scheduled.get(agent, 0) - 1
+        if remaining > 0:
+            self._scheduled[agent] = remaining
+        else:
+            self._scheduled.pop(agent, None)
+
+    def _cancel(self, event):
+        """Mark the queue entry of the triggered *event* as dead. The entry is
+        discarded lazily once it reaches the head of the queue, or when dead
+        entries make up more than :attr:`compact_fraction` of the queue."""
+        if event.agent is not None:
+            self._unschedule(event.agent)
+
+        self._dead += 1
+        self._cancelled_total += 1
+        size = len(self._queue)
+        if (size >= self.compact_min_size and
+                self._dead > size * self.compact_fraction):
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the event queue without cancelled entries."""
+        self._queue[:] = [e for e in self._queue if not e[3]._cancelled]
+        heapify(self._queue)
+        self._dead = 0
 
     @property
     def scheduled_agents(self):
         """
         Returns a list of scheduled agents. Used by the `process` decorator to
-        verify that an agent is not already scheduled.
+        verify that an agent is not already scheduled. Agents of cancelled
+        events are not included.
         """
 
-        return [i[4] for i in self._queue]
+        return list(self._scheduled)
+
+    def is_scheduled(self, agent):
+        """Return ``True`` if *agent* has a live event in the queue."""
+        return agent in self._scheduled
+
+    def run(self, until=None):
+        self._run_start = perf_counter()
+        try:
+            return BaseEnvironment.run(self, until)
+        except BaseException as exc:
+            for hook in self._step_hooks:
+                failed = getattr(hook, 'failed', None)
+                if failed is not None:
+                    failed(exc)
+            raise
+        finally:
+            self._wall += perf_counter() - self._run_start
+            self._run_start = None
+
+    run.__doc__ = BaseEnvironment.run.__doc__
+
+    @property
+    def events_scheduled(self):
+        """Number of events scheduled so far."""
+        return self._processed + self._cancelled_total + self.queue_depth
+
+    @property
+    def events_processed(self):
+        """Number of events processed so far."""
+        return self._processed
+
+    @property
+    def events_cancelled(self):
+        """Number of scheduled events that were cancelled."""
+        return self._cancelled_total
+
+    @property
+    def queue_depth(self):
+        """Number of live (not cancelled) events in the queue."""
+        return len(self._queue) - self._dead
+
+    @property
+    def peak_queue_depth(self):
+        """Highest :attr:`queue_depth` seen so far."""
+        return self._peak
+
+    @property
+    def wall_time(self):
+        """Wall time in seconds spent in :meth:`run()`, including the current
+        run."""
+        if self._run_start is None:
+            return self._wall
+        return self._wall + perf_counter() - self._run_start
+
+    @property
+    def events_per_time(self):
+        """Processed events per unit of simulated time."""
+        elapsed = self._now - self._initial_time
+        return self._processed / elapsed if elapsed else 0.0
+
+    @property
+    def events_per_second(self):
+        """Processed events per wall second spent in :meth:`run()`."""
+        wall = self.wall_time
+        return self._processed / wall if wall else 0.0
+
+    def stats(self):
+        """Return a snapshot of the scheduler counters as a dict."""
+        return {
+            'now': self._now,
+            'events_scheduled': self.events_scheduled,
+            'events_processed': self._processed,
+            'events_cancelled': self._cancelled_total,
+            'queue_depth': self.queue_depth,
+            'peak_queue_depth': self._peak,
+            'wall_time': self.wall_time,
+            'events_per_time': self.events_per_time,
+            'events_per_second': self.events_per_second,
+        }
+
+    def add_step_hook(self, hook):
+        """Call *hook* after every processed event.
+
+        The hook is called as ``hook(entry, callbacks, elapsed)`` with the
+        queue *entry* ``(time, priority, eid, event, agent)`` of the event, the
+        list of *callbacks* that were invoked and the wall time in seconds
+        spent in :meth:`step()`. Hooks are also called if a callback raises.
+        If the hook has a ``failed()`` method, it is called with the exception
+        when one escapes :meth:`run()`.
+
+        While no hooks are registered, :meth:`step()` runs without any
+        instrumentation overhead.
+
+        """
+        self._step_hooks.append(hook)
+        self.step = self._hooked_step
+
+    def remove_step_hook(self, hook):
+        """Stop calling the step *hook*."""
+        self._step_hooks.remove(hook)
+        if not self._step_hooks:
+            del self.step
+
+    def _hooked_step(self):
+        """Wrap the :meth:`step()` of the environment's class and report the
+        processed event to the step hooks."""
+        self.peek()  # Drop cancelled entries from the head of the queue.
+        if not self._queue:
+            raise EmptySchedule()
+
+        entry = self._queue[0]
+        callbacks = entry[3].callbacks
+        start = perf_counter()
+        try:
+            type(self).step(self)
+        finally:
+            elapsed = perf_counter() - start
+            for hook in self._step_hooks:
+                hook(entry, callbacks, elapsed)
 
     def peek(self):
         """Get the time of the next scheduled event. Return
         :data:`~_simpy.core.Infinity` if there is no further event."""
+        queue = self._queue
+        while queue and queue[0][3]._cancelled:
+            heappop(queue)
+            self._dead -= 1
         try:
-            return self._queue[0][0]
+            return queue[0][0]
         except IndexError:
             return Infinity
 
     def step(self):
-        """Process the next event.
+        """Process the next event. Cancelled events are skipped.
 
         Raise an :exc:`EmptySchedule` if no further events are available.
 
         """
+        queue = self._queue
         try:
-            self._now, _, _, event, _ = heappop(self._queue)
+            now, _, _, event, agent = heappop(queue)
+            while event._cancelled:
+                self._dead -= 1
+                now, _, _, event, agent = heappop(queue)
         except IndexError:
             raise EmptySchedule()
 
+        self._now = now
+        self._processed += 1
+        if agent is not None:
+            self._unschedule(agent)
+
         # Process callbacks of the event. Set the events callbacks to None
         # immediately to prevent concurrent modifications.
         callbacks, event.callbacks = event.callbacks, None
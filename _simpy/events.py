@@ -14,6 +14,10 @@ _simpy-agents modifications:
 - added optional 'agent' parameter to `AnyOf.__init__()`
 - modified all calls to `env.schedule()` to include the new 'agent' parameter
 - added `Environment.scheduled_agents` property
+- added `Event.cancel()` to withdraw scheduled events from the queue
+- modified `Condition` to snapshot its processed events while removing its
+  callbacks
+- modified `ConditionValue` to look up events in a lazily built index
 
 .. autosummary::
 
@@ -63,12 +67,18 @@ class Event(object):
     being processed. If a callback handles an exception, it must set
     :attr:`defused` to ``True`` to prevent this.
 
+    A triggered event that has not yet been processed can be withdrawn from the
+    schedule with :meth:`cancel`. Its callbacks will then never be invoked.
+    Note that resource requests override :meth:`cancel` to leave their queue.
+
     This class also implements ``__and__()`` (``&``) and ``__or__()`` (``|``).
     If you concatenate two events using one of these operators,
     a :class:`Condition` event is generated that lets you wait for both or one
     of them.
 
     """
+    _cancelled = False
+
     def __init__(self, env, agent=None):
         self.env = env
         self.agent = agent
@@ -143,6 +153,31 @@ class Event(object):
             raise AttributeError('Value of %s is not yet available' % self)
         return self._value
 
+    @property
+    def cancelled(self):
+        """Becomes ``True`` once the event has been withdrawn from the schedule
+        with :meth:`cancel`."""
+        return self._cancelled
+
+    def cancel(self):
+        """Withdraw the event from the schedule of its environment. The queue
+        entry is not removed immediately but skipped once it is popped, so
+        cancelling is an O(1) operation.
+
+        Raises :exc:`RuntimeError` if the event has not been triggered yet or
+        has already been processed. Cancelling an event twice has no effect.
+
+        """
+        if self._cancelled:
+            return
+        if self._value is PENDING:
+            raise RuntimeError('%s has not been triggered' % self)
+        if self.callbacks is None:
+            raise RuntimeError('%s has already been processed' % self)
+
+        self._cancelled = True
+        self.env._cancel(self)
+
     def trigger(self, event):
         """Trigger the event with the state and value of the provided *event*.
         Return *self* (this event instance).
@@ -436,19 +471,28 @@ class Process(Event):
 class ConditionValue(object):
     """Result of a :class:`~_simpy.events.Condition`. It supports convenient
     dict-like access to the triggered events and their values. The events are
-    ordered by their occurences in the condition."""
+    ordered by their occurences in the condition.
+
+    The dict-like lookup of the events is only built once it is first
+    used."""
 
-    def __init__(self):
-        self.events = []
+    def __init__(self, events=None):
+        self.events = [] if events is None else events
+        self._lookup = None
+
+    def _index(self):
+        if self._lookup is None:
+            self._lookup = dict.fromkeys(self.events)
+        return self._lookup
 
     def __getitem__(self, key):
-        if key not in self.events:
+        if key not in self._index():
             raise KeyError(str(key))
 
         return key._value
 
     def __contains__(self, key):
-        return key in self.events
+        return key in self._index()
 
     def __eq__(self, other):
         if type(other) is ConditionValue:
@@ -530,24 +574,18 @@ class Condition(Event):
         return '%s(%s, %s)' % (self.__class__.__name__,
                                self._evaluate.__name__, self._events)
 
-    def _populate_value(self, value):
-        """Populate the *value* by recursively visiting all nested
-        conditions."""
-
-        for event in self._events:
-            if isinstance(event, Condition):
-                event._populate_value(value)
-            elif event.callbacks is None:
-                value.events.append(event)
-
     def _build_value(self, event):
-        """Build the value of this condition."""
-        self._remove_check_callbacks()
+        """Build the value of this condition from a snapshot of the processed
+        events. The lookup of the :class:`ConditionValue` is only built once
+        it is accessed."""
         if event._ok:
-            self._value = ConditionValue()
-            self._populate_value(self._value)
+            processed = []
+            self._remove_check_callbacks(processed)
+            self._value = ConditionValue(processed)
+        else:
+            self._remove_check_callbacks()
 
-    def _remove_check_callbacks(self):
+    def _remove_check_callbacks(self, processed=None):
         """Remove _check() callbacks from events recursively.
 
         Once the condition has triggered, the condition's events no longer need
@@ -555,12 +593,20 @@ class Condition(Event):
         important to break circular references between the condition and
         untriggered events.
 
+        If *processed* is a list, the processed events that are not conditions
+        themselves are appended to it on the way.
+
         """
         for event in self._events:
-            if event.callbacks and self._check in event.callbacks:
-                event.callbacks.remove(self._check)
+            if event.callbacks:
+                try:
+                    event.callbacks.remove(self._check)
+                except ValueError:
+                    pass
             if isinstance(event, Condition):
-                event._remove_check_callbacks()
+                event._remove_check_callbacks(processed)
+            elif processed is not None and event.callbacks is None:
+                processed.append(event)
 
     def _check(self, event):
         """Check if the condition was already met and schedule the *event* if
@@ -0,0 +1,424 @@
+"""
+Instrumentation of the event loop of an :class:`~_simpy.core.Environment`
+and of shared resources.
+
+The :class:`Profiler`, :class:`EventTrace` and :class:`Sampler` attach
+themselves to an environment as step hooks (see
+:meth:`~_simpy.core.Environment.add_step_hook()`). A
+:class:`ResourceMonitor` is notified by the resource it observes whenever its
+state may have changed. Environments and resources without attached
+instruments run without any overhead.
+
+.. autosummary::
+
+    ~_simpy.monitor.Profiler
+    ~_simpy.monitor.EventTrace
+    ~_simpy.monitor.Sampler
+    ~_simpy.monitor.ResourceMonitor
+
+"""
+import sys
+from math import floor, isinf
+
+import numpy as np
+
+from _simpy.events import Process
+from _simpy.resources.resource import Resource
+from _simpy.resources.container import Container
+from _simpy.resources.store import KeyedStore, ArrayStore
+
+
+class Profiler(object):
+    """Records the wall time spent processing events of *env*.
+
+    The time spent in the callbacks of an event is attributed to the agent the
+    event was scheduled for, to the type of the event and to the generators of
+    the processes it resumed. If an event resumes more than one process, the
+    time is split evenly between them.
+
+    The profiler starts recording immediately unless *start* is ``False``. It
+    can also be used as a context manager:
+
+    .. code-block:: python
+
+        with Profiler(env) as profiler:
+            env.run()
+
+        print(profiler.report())
+
+    """
+    def __init__(self, env, start=True):
+        self.env = env
+        self.agents = {}
+        """Mapping of agent to ``[count, total]`` of processed events and
+        wall time in seconds."""
+        self.event_types = {}
+        """Mapping of event type name to ``[count, total]``."""
+        self.processes = {}
+        """Mapping of process generator name to ``[count, total]``."""
+        self._running = False
+
+        if start:
+            self.start()
+
+    def __enter__(self):
+        if not self._running:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Attach the profiler to the environment."""
+        if self._running:
+            raise RuntimeError('%s is already running' % self)
+        self.env.add_step_hook(self)
+        self._running = True
+
+    def stop(self):
+        """Detach the profiler from the environment. Recorded statistics are
+        kept."""
+        if self._running:
+            self.env.remove_step_hook(self)
+            self._running = False
+
+    def reset(self):
+        """Discard all recorded statistics."""
+        self.agents.clear()
+        self.event_types.clear()
+        self.processes.clear()
+
+    def __call__(self, entry, callbacks, elapsed):
+        event, agent = entry[3], entry[4]
+        self._add(self.agents, agent, elapsed)
+        self._add(self.event_types, type(event).__name__, elapsed)
+
+        procs = [cb.__self__ for cb in callbacks
+                 if getattr(cb, '__func__', None) is Process._resume]
+        for proc in procs:
+            self._add(self.processes, proc._generator.__qualname__,
+                      elapsed / len(procs))
+
+    @staticmethod
+    def _add(stats, key, elapsed):
+        try:
+            record = stats[key]
+        except KeyError:
+            stats[key] = [1, elapsed]
+        else:
+            record[0] += 1
+            record[1] += elapsed
+
+    @staticmethod
+    def top(stats, n=None):
+        """Return the entries of *stats* as ``(key, count, total)`` tuples
+        sorted by descending total wall time, limited to the first *n*."""
+        rows = sorted(((k, c, t) for k, (c, t) in stats.items()),
+                      key=lambda row: row[2], reverse=True)
+        return rows if n is None else rows[:n]
+
+    def report(self, n=10):
+        """Return a text report of the *n* slowest agents, event types and
+        process generators."""
+        lines = []
+        for title, stats in (('Agent', self.agents),
+                             ('Event type', self.event_types),
+                             ('Process', self.processes)):
+            lines.append('%-40s %10s %12s %12s' % (
+                title, 'count', 'total [s]', 'mean [s]'))
+            for key, count, total in self.top(stats, n):
+                lines.append('%-40s %10d %12.6f %12.6f' % (
+                    str(key)[:40], count, total, total / count))
+            lines.append('')
+        return '\n'.join(lines)
+
+
+class EventTrace(object):
+    """Keeps a record of the last *capacity* events processed by *env*.
+
+    Each processed event is written as ``(time, priority, eid, type, agent)``
+    into preallocated arrays that are used as a ring buffer, so the memory
+    footprint stays constant however long the simulation runs. Event types
+    and agents are stored as integer codes into :attr:`event_types` and
+    :attr:`agents`.
+
+    If an exception escapes :meth:`~_simpy.core.Environment.run()`, the trace
+    is written to *dump* (a file-like object, e.g. ``sys.stderr``) if one is
+    given. The trace can also be inspected afterwards with :meth:`records` or
+    written with :meth:`dump`.
+
+    """
+    dtype = np.dtype([('time', 'f8'), ('priority', 'i8'), ('eid', 'i8'),
+                      ('type', 'i4'), ('agent', 'i4')])
+    """Record layout of the trace."""
+
+    def __init__(self, env, capacity=10000, dump=None):
+        if capacity <= 0:
+            raise ValueError('"capacity" must be > 0.')
+
+        self.env = env
+        self.capacity = capacity
+        self.file = dump
+        self.event_types = []
+        """Names of the traced event types, indexed by their code."""
+        self.agents = []
+        """Traced agents, indexed by their code. Events without agent use the
+        code ``-1``."""
+
+        self._time = np.empty(capacity, dtype='f8')
+        self._priority = np.empty(capacity, dtype='i8')
+        self._eid = np.empty(capacity, dtype='i8')
+        self._type = np.empty(capacity, dtype='i4')
+        self._agent = np.empty(capacity, dtype='i4')
+        self._type_codes = {}
+        self._agent_codes = {None: -1}
+        self._count = 0
+
+        env.add_step_hook(self)
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self):
+        """Total number of events traced, including overwritten ones."""
+        return self._count
+
+    def stop(self):
+        """Detach the trace from the environment. Recorded events are
+        kept."""
+        self.env.remove_step_hook(self)
+
+    def __call__(self, entry, callbacks, elapsed):
+        i = self._count % self.capacity
+        self._count += 1
+
+        self._time[i] = entry[0]
+        self._priority[i] = entry[1]
+        self._eid[i] = entry[2]
+
+        cls = type(entry[3])
+        try:
+            self._type[i] = self._type_codes[cls]
+        except KeyError:
+            self._type[i] = self._type_codes[cls] = len(self.event_types)
+            self.event_types.append(cls.__name__)
+
+        agent = entry[4]
+        try:
+            self._agent[i] = self._agent_codes[agent]
+        except KeyError:
+            self._agent[i] = self._agent_codes[agent] = len(self.agents)
+            self.agents.append(agent)
+        except TypeError:
+            # Unhashable agents are recorded without a code.
+            self._agent[i] = -1
+
+    def records(self, n=None):
+        """Return the last *n* (by default all retained) events as a
+        structured array with :attr:`dtype`, ordered from oldest to
+        newest."""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self._count % self.capacity
+        idx = (np.arange(end - n, end) % self.capacity) if n else []
+
+        out = np.empty(n, dtype=self.dtype)
+        out['time'] = self._time[idx]
+        out['priority'] = self._priority[idx]
+        out['eid'] = self._eid[idx]
+        out['type'] = self._type[idx]
+        out['agent'] = self._agent[idx]
+        return out
+
+    def dump(self, file=None, n=None):
+        """Write the last *n* events to *file* (``sys.stderr`` by
+        default)."""
+        file = sys.stderr if file is None else file
+        records = self.records(n)
+        file.write('Last %d of %d processed events:\n' % (
+            len(records), self._count))
+        file.write('%14s %8s %10s  %-16s %s\n' % (
+            'time', 'priority', 'eid', 'type', 'agent'))
+        for rec in records:
+            agent = self.agents[rec['agent']] if rec['agent'] >= 0 else ''
+            file.write('%14.4f %8d %10d  %-16s %s\n' % (
+                rec['time'], rec['priority'], rec['eid'],
+                self.event_types[rec['type']], agent))
+
+    def failed(self, exception):
+        """Write the trace to the *dump* target after a failed run."""
+        if self.file is not None:
+            self.dump(self.file)
+
+
+class Sampler(object):
+    """Periodically samples the scheduler counters of *env* (see
+    :meth:`~_simpy.core.Environment.stats()`).
+
+    A sample is taken at the first processed event at or after every multiple
+    of *interval* units of simulated time. Sampling does not schedule events
+    of its own, so it never keeps a simulation alive. Each sample is appended
+    to :attr:`samples` and passed to *callback* if one is given, which can be
+    used to abort runaway models, e.g. by raising once the queue grows beyond
+    a limit.
+
+    """
+    def __init__(self, env, interval, callback=None):
+        if interval <= 0:
+            raise ValueError('"interval" must be > 0.')
+
+        self.env = env
+        self.interval = interval
+        self.callback = callback
+        self.samples = []
+        """List of the recorded counter snapshots."""
+
+        self._start = env.now
+        self._next = env.now
+        env.add_step_hook(self)
+
+    def stop(self):
+        """Detach the sampler from the environment."""
+        self.env.remove_step_hook(self)
+
+    def __call__(self, entry, callbacks, elapsed):
+        if entry[0] < self._next:
+            return
+
+        periods = floor((entry[0] - self._start) / self.interval) + 1
+        self._next = self._start + periods * self.interval
+
+        sample = self.env.stats()
+        self.samples.append(sample)
+        if self.callback is not None:
+            self.callback(sample)
+
+
+class ResourceMonitor(object):
+    """Keeps time-weighted statistics of the state of *resource*.
+
+    The state consists of the level of the resource and the lengths of its
+    put and get queues. The level is the number of users of a
+    :class:`~_simpy.resources.resource.Resource`, the level of a
+    :class:`~_simpy.resources.container.Container` and the number of items in
+    a store. It can be customized with the *level* function, which receives
+    the resource.
+
+    The integrals of the state over simulated time are accumulated whenever
+    the state changes, so the monitor uses constant memory and does not
+    schedule events of its own. If *record* is given, up to *record* change
+    points are also written into preallocated arrays, e.g. for plotting (see
+    :meth:`records`).
+
+    """
+    dtype = np.dtype([('time', 'f8'), ('level', 'f8'), ('put_queue', 'i8'),
+                      ('get_queue', 'i8')])
+    """Record layout of the change points."""
+
+    def __init__(self, resource, record=0, level=None):
+        if resource._monitor is not None:
+            raise RuntimeError('%s is already monitored' % resource)
+
+        self.resource = resource
+        self.env = resource._env
+        if level is not None:
+            self._level = lambda: level(resource)
+        elif isinstance(resource, Resource):
+            self._level = lambda: len(resource.users)
+        elif isinstance(resource, Container):
+            self._level = lambda: resource.level
+        elif isinstance(resource, (KeyedStore, ArrayStore)):
+            self._level = lambda: resource._size
+        else:
+            self._level = lambda: len(resource.items)
+
+        self.start = self.env.now
+        """Simulation time at which monitoring started."""
+        self._time = self.start
+        self._state = self._observe()
+        self._area = [0.0, 0.0, 0.0]
+        self._max = list(self._state)
+
+        self._records = np.empty(record, dtype=self.dtype)
+        self._count = 0
+        self.dropped = 0
+        """Number of change points that did not fit into the records."""
+        self._record()
+
+        resource._monitor = self
+
+    def __len__(self):
+        return self._count
+
+    def _observe(self):
+        resource = self.resource
+        return (self._level(), len(resource.put_queue),
+                len(resource.get_queue))
+
+    def _record(self):
+        if self._count and self._records['time'][self._count - 1] == \
+                self._time:
+            # Only keep the last state of a point in time.
+            self._count -= 1
+        elif self._count == len(self._records):
+            self.dropped += 1
+            return
+
+        self._records[self._count] = (self._time,) + self._state
+        self._count += 1
+
+    def update(self):
+        """Account for a possible change of the state of the resource. Called
+        by the resource."""
+        state = self._observe()
+        if state == self._state:
+            return
+
+        now = self.env.now
+        elapsed = now - self._time
+        area, peak = self._area, self._max
+        for i in range(3):
+            area[i] += self._state[i] * elapsed
+            if state[i] > peak[i]:
+                peak[i] = state[i]
+
+        self._state, self._time = state, now
+        self._record()
+
+    def stop(self):
+        """Detach the monitor from the resource. Recorded statistics are
+        kept."""
+        if self.resource._monitor is self:
+            self.resource._monitor = None
+
+    def stats(self):
+        """Return a dict with the time-weighted means and the maxima of the
+        level and queue lengths between :attr:`start` and the current
+        simulation time. The utilization is the mean level relative to the
+        capacity of the resource (``None`` for unlimited capacity)."""
+        now = self.env.now
+        duration = now - self.start
+        means = []
+        for area, value in zip(self._area, self._state):
+            area += value * (now - self._time)
+            means.append(area / duration if duration > 0 else value)
+
+        capacity = self.resource.capacity
+        return {
+            'time': duration,
+            'level': means[0],
+            'utilization': None if isinf(capacity) else means[0] / capacity,
+            'put_queue': means[1],
+            'get_queue': means[2],
+            'max_level': self._max[0],
+            'max_put_queue': self._max[1],
+            'max_get_queue': self._max[2],
+        }
+
+    def records(self):
+        """Return the recorded change points as a structured array with
+        :attr:`dtype`. Each state applies from its time until the time of the
+        next change point."""
+        return self._records[:self._count].copy()
@@ -5,7 +5,15 @@ Base classes of for _simpy's shared resource types.
 *put* requests, which return :class:`Put` and :class:`Get` events respectively.
 These events are triggered once the request has been completed.
 
+_simpy-agents modifications:
+- added `EventQueue` and made it the default put and get queue type
+- added notification of an optional resource monitor (see
+  :class:`~_simpy.monitor.ResourceMonitor`)
+- added optional 'agent' parameter to `Put.__init__()` and `Get.__init__()`.
+  The agent counts as scheduled while the request is pending.
 """
+from collections import deque
+
 from _simpy.core import BoundClass
 from _simpy.events import Event
 
@@ -24,11 +32,13 @@ class Put(Event):
             yield request
 
     """
-    def __init__(self, resource):
-        super(Put, self).__init__(resource._env)
+    def __init__(self, resource, agent=None):
+        super(Put, self).__init__(resource._env, agent=agent)
         self.resource = resource
         self.proc = self.env.active_process
 
+        if agent is not None:
+            self.env._hold(agent)
         resource.put_queue.append(self)
         self.callbacks.append(resource._trigger_get)
         resource._trigger_put(None)
@@ -52,6 +62,18 @@ class Put(Event):
         """
         if not self.triggered:
             self.resource.put_queue.remove(self)
+            if self.agent is not None:
+                self.env._unschedule(self.agent)
+            if self.resource._monitor is not None:
+                self.resource._monitor.update()
+
+    def succeed(self, value=None):
+        """Trigger the request. Its agent is now scheduled through the
+        event queue instead of the pending request."""
+        super(Put, self).succeed(value)
+        if self.agent is not None:
+            self.env._unschedule(self.agent)
+        return self
 
 
 class Get(Event):
@@ -68,11 +90,13 @@ class Get(Event):
             item = yield request
 
     """
-    def __init__(self, resource):
-        super(Get, self).__init__(resource._env)
+    def __init__(self, resource, agent=None):
+        super(Get, self).__init__(resource._env, agent=agent)
         self.resource = resource
         self.proc = self.env.active_process
 
+        if agent is not None:
+            self.env._hold(agent)
         resource.get_queue.append(self)
         self.callbacks.append(resource._trigger_put)
         resource._trigger_get(None)
@@ -96,6 +120,37 @@ class Get(Event):
         """
         if not self.triggered:
             self.resource.get_queue.remove(self)
+            if self.agent is not None:
+                self.env._unschedule(self.agent)
+            if self.resource._monitor is not None:
+                self.resource._monitor.update()
+
+    def succeed(self, value=None):
+        """Trigger the request. Its agent is now scheduled through the
+        event queue instead of the pending request."""
+        super(Get, self).succeed(value)
+        if self.agent is not None:
+            self.env._unschedule(self.agent)
+        return self
+
+
+class EventQueue(deque):
+    """Queue of pending requests based on a :class:`collections.deque`.
+
+    Requests are usually processed in order, so popping the request at the
+    head of the queue is O(1) instead of O(n) for a :class:`list`.
+
+    """
+    def pop(self, idx=-1):
+        """Remove and return the request at *idx*."""
+        if idx == 0:
+            return self.popleft()
+        elif idx == -1:
+            return super(EventQueue, self).pop()
+
+        item = self[idx]
+        del self[idx]
+        return item
 
 
 class BaseResource(object):
@@ -116,17 +171,19 @@ class BaseResource(object):
       ``_do_get()`` and ``_do_put()``.
 
     """
-    PutQueue = list
-    """The type to be used for the :attr:`put_queue`. It is a plain
-    :class:`list` by default. The type must support index access (e.g.
+    PutQueue = EventQueue
+    """The type to be used for the :attr:`put_queue`. It is an
+    :class:`EventQueue` by default. The type must support index access (e.g.
     ``__getitem__()`` and ``__len__()``) as well as provide ``append()`` and
-    ``pop()`` operations."""
+    ``pop()`` operations. Cancelled requests are removed with ``remove()``."""
 
-    GetQueue = list
-    """The type to be used for the :attr:`get_queue`. It is a plain
-    :class:`list` by default. The type must support index access (e.g.
+    GetQueue = EventQueue
+    """The type to be used for the :attr:`get_queue`. It is an
+    :class:`EventQueue` by default. The type must support index access (e.g.
     ``__getitem__()`` and ``__len__()``) as well as provide ``append()`` and
-    ``pop()`` operations."""
+    ``pop()`` operations. Cancelled requests are removed with ``remove()``."""
+
+    _monitor = None
 
     def __init__(self, env, capacity):
         self._env = env
@@ -190,6 +247,9 @@ class BaseResource(object):
             if not proceed:
                 break
 
+        if self._monitor is not None:
+            self._monitor.update()
+
     def _do_get(self, event):
         """Perform the *get* operation.
 
@@ -229,3 +289,6 @@ class BaseResource(object):
 
             if not proceed:
                 break
+
+        if self._monitor is not None:
+            self._monitor.update()
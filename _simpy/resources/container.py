@@ -6,6 +6,11 @@ A :class:`Container` can be used to model the fuel tank of a gasoline station.
 Tankers increase and refuelled cars decrease the amount of gas in the station's
 fuel tanks.
 
+_simpy-agents modifications:
+- added optional 'agent' parameter to `ContainerPut.__init__()` and
+  `ContainerGet.__init__()`
+- added partial fulfilment of put and get requests, which is undone when
+  they are cancelled
 """
 from _simpy.core import BoundClass
 from _simpy.resources import base
@@ -18,13 +23,36 @@ class ContainerPut(base.Put):
     Raise a :exc:`ValueError` if ``amount <= 0``.
 
     """
-    def __init__(self, container, amount):
+    def __init__(self, container, amount, partial=False, agent=None):
         if amount <= 0:
             raise ValueError('amount(=%s) must be > 0.' % amount)
         self.amount = amount
         """The amount of matter to be put into the container."""
+        self.partial = partial
+        """If ``True``, matter is put as space becomes available and the
+        request is triggered once all of it has been put."""
+        self.filled = 0
+        """The amount already put by a partial request."""
 
-        super(ContainerPut, self).__init__(container)
+        super(ContainerPut, self).__init__(container, agent)
+
+    def cancel(self):
+        """Cancel this put request.
+
+        The matter already put by a partial request is taken out of the
+        container again, as far as it is still there. :attr:`filled` is
+        reduced accordingly and keeps the amount that could not be taken
+        back.
+
+        """
+        pending = not self.triggered
+        super(ContainerPut, self).cancel()
+        if pending and self.filled:
+            container = self.resource
+            moved = min(self.filled, container._level)
+            container._level -= moved
+            self.filled -= moved
+            container._trigger_put(None)
 
 
 class ContainerGet(base.Get):
@@ -34,13 +62,35 @@ class ContainerGet(base.Get):
     Raise a :exc:`ValueError` if ``amount <= 0``.
 
     """
-    def __init__(self, container, amount):
+    def __init__(self, container, amount, partial=False, agent=None):
         if amount <= 0:
             raise ValueError('amount(=%s) must be > 0.' % amount)
         self.amount = amount
         """The amount of matter to be taken out of the container."""
+        self.partial = partial
+        """If ``True``, matter is taken as it becomes available and the
+        request is triggered once all of it has been taken."""
+        self.filled = 0
+        """The amount already taken by a partial request."""
+
+        super(ContainerGet, self).__init__(container, agent)
 
-        super(ContainerGet, self).__init__(container)
+    def cancel(self):
+        """Cancel this get request.
+
+        The matter already taken by a partial request is put back into the
+        container, as far as there is space for it. :attr:`filled` is
+        reduced accordingly and keeps the amount that could not be put back.
+
+        """
+        pending = not self.triggered
+        super(ContainerGet, self).cancel()
+        if pending and self.filled:
+            container = self.resource
+            moved = min(self.filled, container._capacity - container._level)
+            container._level += moved
+            self.filled -= moved
+            container._trigger_get(None)
 
 
 class Container(base.BaseResource):
@@ -58,6 +108,12 @@ class Container(base.BaseResource):
     Raise a :exc:`ValueError` if ``capacity <= 0``, ``init < 0`` or
     ``init > capacity``.
 
+    Put and get requests with ``partial=True`` move matter as soon as some
+    space or matter is available instead of waiting for the whole *amount*.
+    They are still triggered only once, when the whole amount has been moved.
+    Like other requests, they are served in order. Cancelling a partial
+    request moves its matter back.
+
     """
     def __init__(self, env, capacity=float('inf'), init=0):
         if capacity <= 0:
@@ -70,6 +126,7 @@ class Container(base.BaseResource):
         super(Container, self).__init__(env, capacity)
 
         self._level = init
+        self._moved = False
 
     @property
     def level(self):
@@ -83,13 +140,54 @@ class Container(base.BaseResource):
     """Request to get *amount* of matter out of the container."""
 
     def _do_put(self, event):
-        if self._capacity - self._level >= event.amount:
+        if event.partial:
+            remaining = event.amount - event.filled
+            moved = min(remaining, self._capacity - self._level)
+            if moved == remaining:
+                self._level += moved
+                event.filled = event.amount
+                event.succeed()
+                return True
+            elif moved > 0:
+                self._level += moved
+                event.filled += moved
+                self._moved = True
+        elif self._capacity - self._level >= event.amount:
             self._level += event.amount
             event.succeed()
             return True
 
     def _do_get(self, event):
-        if self._level >= event.amount:
+        if event.partial:
+            remaining = event.amount - event.filled
+            moved = min(remaining, self._level)
+            if moved == remaining:
+                self._level -= moved
+                event.filled = event.amount
+                event.succeed()
+                return True
+            elif moved > 0:
+                self._level -= moved
+                event.filled += moved
+                self._moved = True
+        elif self._level >= event.amount:
             self._level -= event.amount
             event.succeed()
             return True
+
+    def _trigger_put(self, get_event):
+        super(Container, self)._trigger_put(get_event)
+        self._settle()
+
+    def _trigger_get(self, put_event):
+        super(Container, self)._trigger_get(put_event)
+        self._settle()
+
+    def _settle(self):
+        """Partial requests move matter without being triggered, which may
+        unblock requests in the other queue. Re-evaluate both queues until no
+        more matter is moved."""
+        while self._moved:
+            self._moved = False
+            super(Container, self)._trigger_put(None)
+            super(Container, self)._trigger_get(None)
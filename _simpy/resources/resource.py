@@ -27,8 +27,23 @@ Besides :class:`Resource`, there is a :class:`PriorityResource`, where
 processes can define a request priority, and a :class:`PreemptiveResource`
 whose resource users can be preempted by requests with a higher priority.
 
+_simpy-agents modifications:
+- modified `SortedQueue` to insert events with a binary search instead of
+  resorting the queue
+- added `UserSet` to make releasing a usage slot O(1)
+- modified `PreemptiveResource` to find preemption victims with a heap
+- added optional 'agent' parameter to `Release.__init__()` and
+  `PriorityRequest.__init__()`
+- added :class:`MultiRequest` for atomic requests of several resources
+- added 'time' attribute to `Request` to rank it against waiting
+  :class:`MultiRequest` events
 """
+from bisect import bisect_left, bisect_right
+from heapq import heapify, heappop, heappush
+from itertools import count
+
 from _simpy.core import BoundClass
+from _simpy.events import Event
 from _simpy.resources import base
 
 
@@ -60,6 +75,11 @@ class Request(base.Put):
     a :keyword:`with` statement.
 
     """
+    def __init__(self, resource, agent=None):
+        self.time = resource._env.now
+        """The time at which the request was made."""
+        super(Request, self).__init__(resource, agent)
+
     def __exit__(self, exc_type, value, traceback):
         super(Request, self).__exit__(exc_type, value, traceback)
         # Don't release the resource on generator cleanups. This seems to
@@ -73,10 +93,10 @@ class Release(base.Get):
     triggered immediately. Subclass of :class:`_simpy.resources.base.Get`.
 
     """
-    def __init__(self, resource, request):
+    def __init__(self, resource, request, agent=None):
         self.request = request
         """The request (:class:`Request`) that is to be released."""
-        super(Release, self).__init__(resource)
+        super(Release, self).__init__(resource, agent)
 
 
 class PriorityRequest(Request):
@@ -90,7 +110,7 @@ class PriorityRequest(Request):
     :class:`PreemptiveResource`
 
     """
-    def __init__(self, resource, priority=0, preempt=True):
+    def __init__(self, resource, priority=0, preempt=True, agent=None):
         self.priority = priority
         """The priority of this request. A smaller number means higher
         priority."""
@@ -111,18 +131,22 @@ class PriorityRequest(Request):
         requests are more important) and finally the preemption flag (preempt
         requests are more important)."""
 
-        super(PriorityRequest, self).__init__(resource)
+        super(PriorityRequest, self).__init__(resource, agent)
 
 
 class SortedQueue(list):
     """Queue for sorting events by their :attr:`~PriorityRequest.key`
     attribute.
 
+    Keys are kept in a parallel list so that insertion is a binary search.
+    Events with equal keys remain in insertion order.
+
     """
     def __init__(self, maxlen=None):
         super(SortedQueue, self).__init__()
         self.maxlen = maxlen
         """Maximum length of the queue."""
+        self._keys = []
 
     def append(self, item):
         """Sort *item* into the queue.
@@ -133,8 +157,175 @@ class SortedQueue(list):
         if self.maxlen is not None and len(self) >= self.maxlen:
             raise RuntimeError('Cannot append event. Queue is full.')
 
-        super(SortedQueue, self).append(item)
-        super(SortedQueue, self).sort(key=lambda e: e.key)
+        key = item.key
+        idx = bisect_right(self._keys, key)
+        self._keys.insert(idx, key)
+        super(SortedQueue, self).insert(idx, item)
+
+    def pop(self, idx=-1):
+        """Remove and return the event at *idx*."""
+        del self._keys[idx]
+        return super(SortedQueue, self).pop(idx)
+
+    def remove(self, item):
+        """Remove *item* from the queue.
+
+        Raise a :exc:`ValueError` if *item* is not queued.
+
+        """
+        idx = bisect_left(self._keys, item.key)
+        for idx in range(idx, len(self)):
+            if self[idx] is item:
+                self.pop(idx)
+                return
+
+        raise ValueError('Event is not queued.')
+
+
+class UserSet(object):
+    """Insertion ordered set of the :class:`Request` events using a resource.
+
+    Supports the list operations used on :attr:`Resource.users` but removes
+    users in O(1).
+
+    """
+    def __init__(self):
+        self._requests = {}
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __iter__(self):
+        return iter(self._requests)
+
+    def __contains__(self, request):
+        return request in self._requests
+
+    def __getitem__(self, idx):
+        return list(self._requests)[idx]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self._requests))
+
+    def append(self, request):
+        """Add *request* to the users."""
+        self._requests[request] = None
+
+    def remove(self, request):
+        """Remove *request* from the users.
+
+        Raise a :exc:`ValueError` if *request* is not a user.
+
+        """
+        try:
+            del self._requests[request]
+        except KeyError:
+            raise ValueError('Request is not a user.')
+
+
+class MultiRequest(Event):
+    """Request a usage slot of each of the *resources* at once.
+
+    The request is granted atomically once each of the resources has a free
+    slot for it. Until then, no slot is held, so that combined requests can't
+    deadlock. The value of the event is the list of the granted
+    :class:`Request` events, in the order of *resources*.
+
+    Requests are ranked by *priority* (lower values are more important) and
+    request time. Plain :class:`Request` events rank with priority ``0``. A
+    waiting multi-request reserves the free slots of its resources against
+    requests it outranks, so that later or less important requests can't
+    starve it. A request made at the same time with the same priority
+    outranks the multi-request. Free slots stay unused while they are
+    reserved.
+
+    Waiting multi-requests are kept in one heap per combination of
+    resources. Whenever a resource changes, only the head of each heap that
+    includes the resource is checked. Constituents of a
+    :class:`PriorityResource` are requested with *priority* and without
+    preemption.
+
+    If *agent* is given, it counts as scheduled while the request is
+    pending. Like a :class:`Request`, the request can be used as a context
+    manager, which cancels it or releases all of its slots on exit:
+
+    .. code-block:: python
+
+        with MultiRequest([berth, crane, crew], priority=1) as req:
+            yield req
+
+    """
+    _order = count()
+
+    def __init__(self, resources, priority=0, agent=None):
+        self.resources = tuple(resources)
+        """The requested resources."""
+        if not self.resources:
+            raise ValueError('At least one resource is required.')
+        if len(set(self.resources)) != len(self.resources):
+            raise ValueError('A resource can only be requested once.')
+
+        super(MultiRequest, self).__init__(self.resources[0]._env, agent)
+        self.priority = priority
+        """The priority of the request."""
+        self.time = self.env.now
+        """The time at which the request was made."""
+        self.requests = None
+        """The granted :class:`Request` events."""
+        self._withdrawn = False
+        self._held = False
+
+        entry = (priority, self.time, next(self._order), self)
+        if all(r._admits(entry) for r in self.resources):
+            self._grant()
+            return
+
+        combination = frozenset(self.resources)
+        waitlist = None
+        for resource in self.resources:
+            if resource._waitlists is None:
+                resource._waitlists = {}
+            waitlist = resource._waitlists.setdefault(
+                combination, waitlist if waitlist is not None else [])
+
+        heappush(waitlist, entry)
+        if agent is not None:
+            self.env._hold(agent)
+            self._held = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cancel()
+        if self.triggered and exc_type is not GeneratorExit:
+            self.release()
+
+    def _grant(self):
+        self.requests = [r._claim(self.priority) for r in self.resources]
+        self.succeed(self.requests)
+        self._unhold()
+
+    def _unhold(self):
+        if self._held:
+            self._held = False
+            self.env._unschedule(self.agent)
+
+    def cancel(self):
+        """Cancel the request if it is still pending."""
+        if not self.triggered and not self._withdrawn:
+            self._withdrawn = True
+            self._unhold()
+            # Requests that were outranked by this request may proceed now.
+            for resource in self.resources:
+                resource._grant_queued()
+                resource._settle()
+
+    def release(self):
+        """Release all granted slots. Return the list of :class:`Release`
+        events."""
+        return [resource.release(request)
+                for resource, request in zip(self.resources, self.requests)]
 
 
 class Resource(base.BaseResource):
@@ -154,9 +345,9 @@ class Resource(base.BaseResource):
 
         super(Resource, self).__init__(env, capacity)
 
-        self.users = []
-        """List of :class:`Request` events for the processes that are currently
-        using the resource."""
+        self.users = UserSet()
+        """:class:`UserSet` of :class:`Request` events for the processes that
+        are currently using the resource."""
         self.queue = self.put_queue
         """Queue of pending :class:`Request` events. Alias of
         :attr:`~_simpy.resources.base.BaseResource.put_queue`.
@@ -173,12 +364,133 @@ class Resource(base.BaseResource):
     release = BoundClass(Release)
     """Release a usage slot."""
 
+    _waitlists = None
+    _claiming = None
+    _worklist = None  # Resources to settle, shared by all resources.
+
+    def _reservation(self):
+        """Return the heap entry of the best waiting :class:`MultiRequest`
+        that includes this resource or ``None``."""
+        best = None
+        for waitlist in self._waitlists.values():
+            while waitlist and waitlist[0][-1]._withdrawn:
+                heappop(waitlist)
+            if waitlist and (best is None or waitlist[0] < best):
+                best = waitlist[0]
+        return best
+
+    def _outranked(self, event):
+        """Return ``True`` if a waiting :class:`MultiRequest` has reserved the
+        free slots of this resource against *event*."""
+        if not self._waitlists or event is self._claiming:
+            return False
+        best = self._reservation()
+        return (best is not None and
+                best[:2] < (getattr(event, 'priority', 0), event.time))
+
+    def _admits(self, entry):
+        """Return ``True`` if the :class:`MultiRequest` heap *entry* could take
+        a free slot now, i.e. it outranks the head of the queue and all other
+        waiting multi-requests of this resource."""
+        if len(self.users) >= self._capacity:
+            return False
+        if self.put_queue:
+            head = self.put_queue[0]
+            if not entry[:2] < (getattr(head, 'priority', 0), head.time):
+                return False
+        if self._waitlists:
+            best = self._reservation()
+            return best is None or not best < entry
+        return True
+
+    def _claim(self, priority):
+        """Return a granted :class:`Request` for a :class:`MultiRequest`. The
+        request takes a free slot regardless of the queue."""
+        self._claiming = True
+        try:
+            if isinstance(self, PriorityResource):
+                request = self.request(priority=priority, preempt=False)
+            else:
+                request = self.request()
+            self._claiming = request
+            self.put_queue.remove(request)
+            self._do_put(request)
+        finally:
+            self._claiming = None
+        return request
+
     def _do_put(self, event):
-        if len(self.users) < self.capacity:
+        if len(self.users) < self.capacity and not self._outranked(event):
             self.users.append(event)
             event.usage_since = self._env.now
             event.succeed()
 
+    def _trigger_put(self, get_event):
+        if self._claiming is not None:
+            # The new request of a MultiRequest is granted by _claim().
+            return
+        super(Resource, self)._trigger_put(get_event)
+        if self._waitlists:
+            self._settle()
+
+    def _grant_queued(self):
+        """Grant queued requests as long as there are free slots for them,
+        e.g. after a reservation has been lifted."""
+        while self.put_queue and len(self.users) < self._capacity:
+            pending = len(self.put_queue)
+            super(Resource, self)._trigger_put(None)
+            if len(self.put_queue) == pending:
+                break
+
+    def _settle(self):
+        """Grant the waiting :class:`MultiRequest` events of this resource.
+        Granting a multi-request lifts its reservations, so the queued
+        requests and multi-requests of all of its resources are reconsidered.
+
+        The affected resources are processed from a worklist instead of
+        recursively, so that any number of multi-requests can be granted at
+        once."""
+        worklist = Resource._worklist
+        if worklist is not None:
+            if self not in worklist:
+                worklist.append(self)
+            return
+
+        worklist = Resource._worklist = [self]
+        try:
+            while worklist:
+                resource = worklist.pop()
+                for multi in resource._grant_waiting():
+                    for other in multi.resources:
+                        other._grant_queued()
+                        if other._waitlists and other not in worklist:
+                            worklist.append(other)
+        finally:
+            Resource._worklist = None
+
+    def _grant_waiting(self):
+        """Grant the waiting :class:`MultiRequest` events that include this
+        resource, best rank first, as long as all of their resources admit
+        them. Return the list of granted multi-requests."""
+        granted = []
+        while True:
+            best = None
+            for waitlist in self._waitlists.values():
+                while waitlist and waitlist[0][-1]._withdrawn:
+                    heappop(waitlist)
+                if not waitlist or (best is not None and
+                                    waitlist[0] >= best[0]):
+                    continue
+                entry = waitlist[0]
+                if all(r._admits(entry) for r in entry[-1].resources):
+                    best = waitlist
+
+            if best is None:
+                return granted
+            multi = heappop(best)[-1]
+            multi._grant()
+            granted.append(multi)
+
     def _do_get(self, event):
         try:
             self.users.remove(event.request)
@@ -198,7 +510,7 @@ class PriorityResource(Resource):
     PutQueue = SortedQueue
     """Type of the put queue. See
     :attr:`~_simpy.resources.base.BaseResource.put_queue` for details."""
-    GetQueue = list
+    GetQueue = base.EventQueue
     """Type of the get queue. See
     :attr:`~_simpy.resources.base.BaseResource.get_queue` for details."""
 
@@ -219,15 +531,44 @@ class PreemptiveResource(PriorityResource):
     :class:`~_simpy.exceptions.Interrupt` with a :class:`Preempted` instance as
     cause.
 
+    Users are kept in a heap ordered by their
+    :attr:`~PriorityRequest.key`, so that the user to preempt is found in
+    O(log n). Released users are removed from the heap lazily.
+
     """
+    def __init__(self, env, capacity=1):
+        super(PreemptiveResource, self).__init__(env, capacity)
+        self._victims = []
+        self._order = count()
+
+    def _victim(self):
+        """Return the user with the largest key, which is preempted first."""
+        while self._victims[0][-1] not in self.users:
+            heappop(self._victims)
+        return self._victims[0][-1]
+
     def _do_put(self, event):
-        if len(self.users) >= self.capacity and event.preempt:
+        if (len(self.users) >= self.capacity and event.preempt and
+                not self._outranked(event)):
             # Check if we can preempt another process
-            preempt = sorted(self.users, key=lambda e: e.key)[-1]
+            preempt = self._victim()
             if preempt.key > event.key:
+                heappop(self._victims)
                 self.users.remove(preempt)
                 preempt.proc.interrupt(Preempted(
                     by=event.proc, usage_since=preempt.usage_since,
                     resource=self))
 
-        return super(PreemptiveResource, self)._do_put(event)
+        super(PreemptiveResource, self)._do_put(event)
+        if event.triggered:
+            # Negate the key to pop the largest key first. Later users are
+            # preempted first among equal keys.
+            priority, time, preempt = event.key
+            heappush(self._victims, (
+                -priority, -time, -preempt, -next(self._order), event))
+
+    def _do_get(self, event):
+        super(PreemptiveResource, self)._do_get(event)
+        if len(self._victims) > 2 * len(self.users):
+            self._victims = [e for e in self._victims if e[-1] in self.users]
+            heapify(self._victims)
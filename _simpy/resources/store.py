@@ -5,11 +5,24 @@ requests for specific objects.
 The :class:`Store` operates in a FIFO (first-in, first-out) order. Objects are
 retrieved from the store in the order they were put in. The *get* requests of a
 :class:`FilterStore` can be customized by a filter to only retrieve objects
-matching a given criterion.
-
+matching a given criterion. The *get* requests of a :class:`KeyedStore` ask
+for items with specific keys.
+
+_simpy-agents modifications:
+- added :class:`KeyedStore`
+- added optional 'agent' parameter to `StorePut.__init__()` and
+  `FilterStoreGet.__init__()`
+- added `Store.put_many()` and `Store.get_many()`
+- modified `Store` to keep serving requests after a batch request was
+  processed
+- added :class:`ArrayStore` with :class:`ArrayStorePut` and
+  :class:`ArrayStorePutMany` requests
 """
 from heapq import heappush, heappop
-from collections import namedtuple
+from itertools import count
+from collections import deque, namedtuple
+
+import numpy as np
 
 from _simpy.core import BoundClass
 from _simpy.resources import base
@@ -20,10 +33,10 @@ class StorePut(base.Put):
     there is space for the item in the store.
 
     """
-    def __init__(self, store, item):
+    def __init__(self, store, item, agent=None):
         self.item = item
         """The item to put into the store."""
-        super(StorePut, self).__init__(store)
+        super(StorePut, self).__init__(store, agent)
 
 
 class StoreGet(base.Get):
@@ -34,6 +47,45 @@ class StoreGet(base.Get):
     pass
 
 
+class StorePutMany(base.Put):
+    """Request to put all *items* into the *store* at once. The request is
+    triggered once there is space for all items in the store.
+
+    Raise a :exc:`ValueError` if there are no *items* or more than the
+    capacity of the *store*.
+
+    """
+    def __init__(self, store, items, agent=None):
+        self.items = list(items)
+        """The items to put into the store."""
+        if not self.items:
+            raise ValueError('At least one item is required.')
+        if len(self.items) > store._capacity:
+            raise ValueError('%s items exceed the capacity (=%s) of the '
+                             'store.' % (len(self.items), store._capacity))
+        super(StorePutMany, self).__init__(store, agent)
+
+
+class StoreGetMany(base.Get):
+    """Request to get *n* items from the *store* at once. The request is
+    triggered with the list of items once there are at least *n* items
+    available in the store.
+
+    Raise a :exc:`ValueError` if ``n <= 0`` or *n* exceeds the capacity of
+    the *store*.
+
+    """
+    def __init__(self, store, n, agent=None):
+        if n <= 0:
+            raise ValueError('n(=%s) must be > 0.' % n)
+        if n > store._capacity:
+            raise ValueError('n(=%s) exceeds the capacity (=%s) of the '
+                             'store.' % (n, store._capacity))
+        self.n = n
+        """The number of items to get."""
+        super(StoreGetMany, self).__init__(store, agent)
+
+
 class FilterStoreGet(StoreGet):
     """Request to get an *item* from the *store* matching the *filter*. The
     request is triggered once there is such an item available in the store.
@@ -44,10 +96,10 @@ class FilterStoreGet(StoreGet):
     :class:`StoreGet`.
 
     """
-    def __init__(self, resource, filter=lambda item: True):
+    def __init__(self, resource, filter=lambda item: True, agent=None):
         self.filter = filter
         """The filter function to filter items in the store."""
-        super(FilterStoreGet, self).__init__(resource)
+        super(FilterStoreGet, self).__init__(resource, agent)
 
 
 class Store(base.BaseResource):
@@ -74,15 +126,50 @@ class Store(base.BaseResource):
     get = BoundClass(StoreGet)
     """Request to get an *item* out of the store."""
 
+    put_many = BoundClass(StorePutMany)
+    """Request to put all *items* into the store at once."""
+
+    get_many = BoundClass(StoreGetMany)
+    """Request to get *n* items out of the store at once."""
+
     def _do_put(self, event):
-        if len(self.items) < self._capacity:
+        if isinstance(event, StorePutMany):
+            if len(self.items) + len(event.items) <= self._capacity:
+                self.items.extend(event.items)
+                event.succeed()
+                return True
+        elif len(self.items) < self._capacity:
             self.items.append(event.item)
             event.succeed()
 
     def _do_get(self, event):
-        if self.items:
+        if isinstance(event, StoreGetMany):
+            if len(self.items) >= event.n:
+                items = self.items[:event.n]
+                del self.items[:event.n]
+                event.succeed(items)
+                return True
+        elif self.items:
             event.succeed(self.items.pop(0))
 
+    def _trigger_put(self, get_event):
+        # A processed batch get may make room for several put requests.
+        pending = None
+        while len(self.put_queue) != pending:
+            pending = len(self.put_queue)
+            super(Store, self)._trigger_put(get_event)
+            if not isinstance(get_event, StoreGetMany):
+                break
+
+    def _trigger_get(self, put_event):
+        # A processed batch put may satisfy several get requests.
+        pending = None
+        while len(self.get_queue) != pending:
+            pending = len(self.get_queue)
+            super(Store, self)._trigger_get(put_event)
+            if not isinstance(put_event, StorePutMany):
+                break
+
 
 class PriorityItem(namedtuple('PriorityItem', 'priority item')):
     """Wrap an arbitrary *item* with an orderable *priority*.
@@ -111,12 +198,22 @@ class PriorityStore(Store):
     """
 
     def _do_put(self, event):
-        if len(self.items) < self._capacity:
+        if isinstance(event, StorePutMany):
+            if len(self.items) + len(event.items) <= self._capacity:
+                for item in event.items:
+                    heappush(self.items, item)
+                event.succeed()
+                return True
+        elif len(self.items) < self._capacity:
             heappush(self.items, event.item)
             event.succeed()
 
     def _do_get(self, event):
-        if self.items:
+        if isinstance(event, StoreGetMany):
+            if len(self.items) >= event.n:
+                event.succeed([heappop(self.items) for _ in range(event.n)])
+                return True
+        elif self.items:
             event.succeed(heappop(self.items))
 
 
@@ -150,9 +247,418 @@ class FilterStore(Store):
     the store."""
 
     def _do_get(self, event):
+        if isinstance(event, StoreGetMany):
+            super(FilterStore, self)._do_get(event)
+            return True
+
         for item in self.items:
             if event.filter(item):
                 self.items.remove(item)
                 event.succeed(item)
                 break
         return True
+
+
+class KeyedStorePut(StorePut):
+    """Request to put *item* with *key* into the *store*. If *key* is
+    ``None``, it is computed with the :attr:`~KeyedStore.key` function of the
+    store.
+
+    """
+    def __init__(self, store, item, key=None, agent=None):
+        self.key = store.key(item) if key is None else key
+        """The key of the item."""
+        super(KeyedStorePut, self).__init__(store, item, agent)
+
+
+class KeyedStoreGet(StoreGet):
+    """Request to get an *item* with one of the given *keys* out of the
+    *store*. The request is triggered once there is such an item available in
+    the store.
+
+    """
+    def __init__(self, store, *keys, agent=None):
+        if not keys:
+            raise ValueError('At least one key is required.')
+
+        self.keys = keys
+        """The keys of the items the request accepts."""
+        super(KeyedStoreGet, self).__init__(store, agent)
+
+
+class KeyedQueue(object):
+    """Queue of pending :class:`KeyedStoreGet` requests, indexed by their
+    keys.
+
+    Requests are kept in an insertion ordered dict and indexed by each of
+    their keys. Removing a cancelled or triggered request also removes it
+    from the per-key indices, which is cheap as it is usually close to their
+    front.
+
+    """
+    def __init__(self):
+        self._events = {}
+        self._index = {}
+        self.last = None
+        """The most recently added request."""
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def __getitem__(self, idx):
+        return list(self._events)[idx]
+
+    def append(self, event):
+        self._events[event] = None
+        for key in event.keys:
+            try:
+                self._index[key].append(event)
+            except KeyError:
+                self._index[key] = deque([event])
+        self.last = event
+
+    def remove(self, event):
+        del self._events[event]
+        for key in event.keys:
+            queue = self._index.get(key)
+            if queue is None:
+                continue
+            if queue[0] is event:
+                queue.popleft()
+            else:
+                try:
+                    queue.remove(event)
+                except ValueError:
+                    pass
+            if not queue:
+                del self._index[key]
+
+    def pop(self, idx=-1):
+        event = self[idx]
+        self.remove(event)
+        return event
+
+    def first(self, key):
+        """Return the oldest pending request for *key* or ``None``."""
+        queue = self._index.get(key)
+        return queue[0] if queue else None
+
+
+class KeyedStore(base.BaseResource):
+    """Resource with *capacity* slots for storing objects by key. Like the
+    :class:`Store`, the *capacity* is unlimited by default.
+
+    Every item has a key, which is passed to :meth:`put()` or computed with
+    the function *key* (by default the item itself is its key). Get requests
+    name one or more keys and receive the oldest item with one of these keys.
+    Items are kept in one :class:`~collections.deque` per key and pending
+    get requests are indexed by key, so that put and get requests don't need
+    to scan the store like a :class:`FilterStore`.
+
+    As for the :class:`FilterStore`, get requests won't necessarily be
+    triggered in the same order they were issued.
+
+    """
+    GetQueue = KeyedQueue
+    """Type of the get queue. See
+    :attr:`~_simpy.resources.base.BaseResource.get_queue` for details."""
+
+    def __init__(self, env, capacity=float('inf'), key=lambda item: item):
+        if capacity <= 0:
+            raise ValueError('"capacity" must be > 0.')
+
+        super(KeyedStore, self).__init__(env, capacity)
+
+        self.key = key
+        """The function computing the key of an item."""
+        self._items = {}
+        self._size = 0
+        self._order = count()
+
+    @property
+    def items(self):
+        """List of the items available in the store, in the order they were
+        put into the store."""
+        return [item for _, item in sorted(
+            (entry for queue in self._items.values() for entry in queue),
+            key=lambda entry: entry[0])]
+
+    def count(self, key):
+        """Number of items with *key* available in the store."""
+        return len(self._items.get(key, ()))
+
+    put = BoundClass(KeyedStorePut)
+    """Request to put *item* with *key* into the store."""
+
+    get = BoundClass(KeyedStoreGet)
+    """Request to get an *item* with one of the given *keys* out of the
+    store."""
+
+    def _do_put(self, event):
+        if self._size < self._capacity:
+            entry = (next(self._order), event.item)
+            try:
+                self._items[event.key].append(entry)
+            except KeyError:
+                self._items[event.key] = deque([entry])
+            self._size += 1
+            event.succeed()
+
+    def _do_get(self, event):
+        oldest = None
+        for key in event.keys:
+            queue = self._items.get(key)
+            if queue and (oldest is None or queue[0][0] < oldest[0]):
+                oldest = queue[0][0], key
+
+        if oldest is not None:
+            _, key = oldest
+            queue = self._items[key]
+            _, item = queue.popleft()
+            if not queue:
+                del self._items[key]
+            self._size -= 1
+            self.get_queue.remove(event)
+            event.succeed(item)
+
+    def _trigger_get(self, put_event):
+        """Trigger get events.
+
+        A new get request only needs to check its own keys and a processed put
+        request only the oldest get requests for the key of its item.
+
+        """
+        if put_event is None:
+            self._do_get(self.get_queue.last)
+        else:
+            key = put_event.key
+            while key in self._items:
+                event = self.get_queue.first(key)
+                if event is None:
+                    break
+                self._do_get(event)
+
+        if self._monitor is not None:
+            self._monitor.update()
+
+
+class ArrayStorePut(StorePut):
+    """Request to put *item* into the :class:`ArrayStore` *store*. The item is
+    converted to the dtype of the store before the request is queued.
+
+    Raise a :exc:`ValueError` if *item* is not a single item of that dtype.
+
+    """
+    def __init__(self, store, item, agent=None):
+        item = np.asarray(item, dtype=store.dtype)
+        if item.ndim != 0:
+            raise ValueError('item(=%s) is not a single item.' % item)
+        super(ArrayStorePut, self).__init__(store, item, agent)
+
+
+class ArrayStorePutMany(StorePutMany):
+    """Request to put all *items* into the :class:`ArrayStore` *store* at
+    once. The items are converted to an array of the dtype of the store
+    before the request is queued.
+
+    Raise a :exc:`ValueError` if *items* is not a non-empty sequence of items
+    of that dtype or exceeds the capacity of the *store*.
+
+    """
+    def __init__(self, store, items, agent=None):
+        self.items = np.asarray(items, dtype=store.dtype)
+        """The items to put into the store."""
+        if self.items.ndim != 1 or not len(self.items):
+            raise ValueError('items must be a non-empty sequence of items.')
+        if len(self.items) > store._capacity:
+            raise ValueError('%s items exceed the capacity (=%s) of the '
+                             'store.' % (len(self.items), store._capacity))
+        super(StorePutMany, self).__init__(store, agent)
+
+
+class ArrayStore(base.BaseResource):
+    """Resource with *capacity* slots for storing numbers or fixed-width
+    records of *dtype* in a preallocated NumPy array, without a Python object
+    per stored item.
+
+    By default, items are retrieved in first-in first-out order from a ring
+    buffer, so that :meth:`put()` and :meth:`get()` are O(1). If *priority*
+    is ``True``, the array is kept as a binary heap and the smallest item is
+    retrieved first in O(log n). Records of a structured *dtype* are ordered
+    by their field *key*. Items with equal keys are retrieved in the order
+    they were put. Items are returned as NumPy scalars.
+
+    :meth:`put_many()` and :meth:`get_many()` move whole arrays of items at
+    once and :attr:`items` returns the stored items as an array in retrieval
+    order.
+
+    """
+    def __init__(self, env, capacity, dtype=float, priority=False, key=None):
+        if capacity <= 0 or capacity == float('inf'):
+            raise ValueError('"capacity" must be finite and > 0.')
+
+        super(ArrayStore, self).__init__(env, int(capacity))
+
+        self.priority = priority
+        """Whether the smallest item is retrieved first."""
+        self._buffer = np.zeros(self._capacity, dtype=dtype)
+        if key is not None:
+            self._keys = self._buffer[key]
+        elif self._buffer.dtype.names is None:
+            self._keys = self._buffer
+        elif priority:
+            raise ValueError('"key" is required for structured dtypes.')
+        if priority:
+            # Insertion sequence numbers break ties between equal keys.
+            self._seq = np.zeros(self._capacity, dtype=np.int64)
+            self._next_seq = 0
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dtype(self):
+        """Data type of the stored items."""
+        return self._buffer.dtype
+
+    @property
+    def items(self):
+        """Array of the items available in the store, in the order they
+        would be retrieved."""
+        if self.priority:
+            return self._buffer[:self._size][self._order()]
+        return self._buffer[self._index(0, self._size)]
+
+    put = BoundClass(ArrayStorePut)
+    """Request to put *item* into the store."""
+
+    get = BoundClass(StoreGet)
+    """Request to get an *item* out of the store."""
+
+    put_many = BoundClass(ArrayStorePutMany)
+    """Request to put all *items* into the store at once."""
+
+    get_many = BoundClass(StoreGetMany)
+    """Request to get *n* items out of the store at once. The request is
+    triggered with an array of the items."""
+
+    def _index(self, start, n):
+        """Return the buffer indices of *n* ring buffer slots, starting
+        *start* slots after the head."""
+        return (self._head + start + np.arange(n)) % self._capacity
+
+    def _do_put(self, event):
+        if isinstance(event, StorePutMany):
+            items = event.items
+            n = len(items)
+            if self._size + n > self._capacity:
+                return
+            if self.priority:
+                self._buffer[self._size:self._size + n] = items
+                self._seq[self._size:self._size + n] = np.arange(
+                    self._next_seq, self._next_seq + n)
+                self._next_seq += n
+                self._size += n
+                # A sorted array is a valid heap.
+                self._sort()
+            else:
+                self._buffer[self._index(self._size, n)] = items
+                self._size += n
+        elif self._size < self._capacity:
+            if self.priority:
+                self._push(event.item)
+            else:
+                tail = (self._head + self._size) % self._capacity
+                self._buffer[tail] = event.item
+                self._size += 1
+        else:
+            return
+
+        event.succeed()
+        return True
+
+    def _do_get(self, event):
+        if isinstance(event, StoreGetMany):
+            n = event.n
+            if self._size < n:
+                return
+            if self.priority:
+                self._sort()
+                items = self._buffer[:n].copy()
+                self._size -= n
+                self._buffer[:self._size] = self._buffer[n:n + self._size]
+                self._seq[:self._size] = self._seq[n:n + self._size]
+            else:
+                items = self._buffer[self._index(0, n)]
+                self._head = (self._head + n) % self._capacity
+                self._size -= n
+            event.succeed(items)
+        elif self._size:
+            if self.priority:
+                item = self._pop()
+            else:
+                item = self._buffer[self._head].copy()
+                self._head = (self._head + 1) % self._capacity
+                self._size -= 1
+            event.succeed(item)
+        else:
+            return
+
+        return True
+
+    def _order(self):
+        """Return the indices of the heap items sorted by key and insertion
+        sequence."""
+        size = self._size
+        return np.lexsort((self._seq[:size], self._keys[:size]))
+
+    def _sort(self):
+        """Sort the heap, which keeps it a valid heap."""
+        order = self._order()
+        self._buffer[:self._size] = self._buffer[:self._size][order]
+        self._seq[:self._size] = self._seq[:self._size][order]
+
+    def _push(self, item):
+        buffer, keys, seqs = self._buffer, self._keys, self._seq
+        pos = self._size
+        buffer[pos] = item
+        self._size += 1
+        record, key, seq = buffer[pos].copy(), keys[pos], self._next_seq
+        self._next_seq += 1
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if not (key, seq) < (keys[parent], seqs[parent]):
+                break
+            buffer[pos] = buffer[parent]
+            seqs[pos] = seqs[parent]
+            pos = parent
+        buffer[pos] = record
+        seqs[pos] = seq
+
+    def _pop(self):
+        buffer, keys, seqs = self._buffer, self._keys, self._seq
+        top = buffer[0].copy()
+        self._size -= 1
+        size = self._size
+        if size:
+            record, key, seq = buffer[size].copy(), keys[size], seqs[size]
+            pos = 0
+            child = 1
+            while child < size:
+                if child + 1 < size and ((keys[child + 1], seqs[child + 1]) <
+                                         (keys[child], seqs[child])):
+                    child += 1
+                if not (keys[child], seqs[child]) < (key, seq):
+                    break
+                buffer[pos] = buffer[child]
+                seqs[pos] = seqs[child]
+                pos = child
+                child = 2 * pos + 1
+            buffer[pos] = record
+            seqs[pos] = seq
+        return top
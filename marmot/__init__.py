@@ -11,6 +11,7 @@ from ._core import ge, gt, le, lt, true, false
 from .agent import Agent, process
 from .object import Object
 from ._version import get_versions
+from .resources import GatedResource
 from .environment import Environment
 
 __version__ = get_versions()["version"]
@@ -9,6 +9,8 @@ __status__ = "Development"
 from math import ceil
 from functools import wraps
 
+import numpy as np
+
 from .object import Object
 from ._exceptions import (
     StateExhausted,
@@ -40,7 +42,7 @@ def process(func):
         if env is None:
             raise AgentNotRegistered(agent)
 
-        if agent in env.scheduled_agents:
+        if env.is_scheduled(agent):
             raise AgentAlreadyScheduled(agent)
 
         try:
@@ -68,9 +70,18 @@ class Agent(Object):
         """
 
         super().__init__(name)
+        self._log_code = None
 
     @process
-    def task(self, name, duration, constraints={}, suspendable=False, **kwargs):
+    def task(
+        self,
+        name,
+        duration,
+        constraints={},
+        suspendable=False,
+        compact=False,
+        **kwargs,
+    ):
         """
         Represents a task of length `duration` to be completed by the agent.
         Requires the agent to be registered with an `Environment`.
@@ -95,8 +106,16 @@ class Agent(Object):
             - Value: `Constraint` to be applied.
         suspendable : bool
             Controls if the task can be suspended during operation.
+        compact : bool
+            Only used if `suspendable`. Yields a single timeout for the whole
+            task and submits one action log with the durations of all work
+            and delay segments in its `segments` array instead of one log per
+            segment. Compact logs are expanded by `expand_segments`,
+            `Timeline` and the aggregators in `marmot.stats`.
+            Default: False
         """
 
+        name = str(name)
         if suspendable:
             try:
                 durations = self.env.calculate_operational_delays(duration, constraints)
@@ -105,19 +124,11 @@ class Agent(Object):
                 e.agent = self
                 raise e
 
-            if len(durations) % 2 != 0:
-                first = durations.pop(0)
-                yield self.timeout(first)
-                self.submit_action_log(str(name), first, **kwargs)
-
-            for i, d in enumerate(durations):
-                yield self.timeout(d)
-
-                if i % 2 == 0:
-                    self.submit_action_log("Delay", d, **kwargs)
+            if compact:
+                yield from self._compact_task(name, durations, **kwargs)
 
-                else:
-                    self.submit_action_log(str(name), d, **kwargs)
+            else:
+                yield from self._segmented_task(name, durations, **kwargs)
 
         else:
             try:
@@ -132,7 +143,55 @@ class Agent(Object):
                 self.submit_action_log("Delay", delay, **kwargs)
 
             yield self.timeout(duration)
-            self.submit_action_log(str(name), duration, **kwargs)
+            self.submit_action_log(name, duration, **kwargs)
+
+    def _segmented_task(self, name, durations, **kwargs):
+        """
+        Yields a timeout for each work and delay segment of a suspendable task
+        and submits an action log after each one.
+
+        Parameters
+        ----------
+        name : str
+            Name of task.
+        durations : list
+            Work and delay segments from
+            `Environment.calculate_operational_delays`.
+        """
+
+        if len(durations) % 2 != 0:
+            first = durations.pop(0)
+            yield self.timeout(first)
+            self.submit_action_log(name, first, **kwargs)
+
+        for i, d in enumerate(durations):
+            yield self.timeout(d)
+
+            if i % 2 == 0:
+                self.submit_action_log("Delay", d, **kwargs)
+
+            else:
+                self.submit_action_log(name, d, **kwargs)
+
+    def _compact_task(self, name, durations, **kwargs):
+        """
+        Yields a single timeout for all segments of a suspendable task and
+        submits one action log with the segment durations in `segments`.
+
+        Parameters
+        ----------
+        name : str
+            Name of task.
+        durations : list
+            Work and delay segments from
+            `Environment.calculate_operational_delays`.
+        """
+
+        total = sum(durations)
+        yield self.timeout(total)
+        self.submit_action_log(
+            name, total, segments=np.array(durations, dtype=float), **kwargs
+        )
 
     @process
     def timeout(self, duration):
@@ -152,6 +211,103 @@ class Agent(Object):
 
         yield self.env.timeout(duration, agent=self)
 
+    @process
+    def request(self, resource, action="Wait", **kwargs):
+        """
+        Requests a usage slot of `resource` on behalf of the agent. The agent
+        counts as scheduled while the request is pending and the time spent
+        waiting is logged as `action`. The value of the returned process is
+        the granted request, which must be released with
+        `resource.release(request)`.
+
+        Parameters
+        ----------
+        resource : `_simpy.Resource`
+            Resource to request, e.g. a `GatedResource`.
+        action : str
+            Action name of the waiting time log.
+            Default: 'Wait'
+        kwargs
+            Passed to `resource.request`, e.g. `priority`.
+
+        Raises
+        ------
+        AgentNotRegistered
+        AgentAlreadyScheduled
+        """
+
+        request = resource.request(agent=self, **kwargs)
+        yield from self._wait(request, action)
+        return request
+
+    @process
+    def put(self, resource, *args, action="Wait", **kwargs):
+        """
+        Puts into `resource` on behalf of the agent, e.g. an amount into a
+        `Container` or an item into a `Store`. The agent counts as scheduled
+        while the request is pending and the time spent waiting is logged as
+        `action`.
+
+        Parameters
+        ----------
+        resource : `_simpy` resource
+        action : str
+            Action name of the waiting time log.
+            Default: 'Wait'
+        args, kwargs
+            Passed to `resource.put`.
+
+        Raises
+        ------
+        AgentNotRegistered
+        AgentAlreadyScheduled
+        """
+
+        event = resource.put(*args, agent=self, **kwargs)
+        return (yield from self._wait(event, action))
+
+    @process
+    def get(self, resource, *args, action="Wait", **kwargs):
+        """
+        Gets from `resource` on behalf of the agent, e.g. an amount from a
+        `Container` or an item from a `Store`. The agent counts as scheduled
+        while the request is pending and the time spent waiting is logged as
+        `action`. The value of the returned process is the value of the get
+        request, e.g. the item.
+
+        Parameters
+        ----------
+        resource : `_simpy` resource
+        action : str
+            Action name of the waiting time log.
+            Default: 'Wait'
+        args, kwargs
+            Passed to `resource.get`.
+
+        Raises
+        ------
+        AgentNotRegistered
+        AgentAlreadyScheduled
+        """
+
+        event = resource.get(*args, agent=self, **kwargs)
+        return (yield from self._wait(event, action))
+
+    def _wait(self, event, action):
+        """
+        Yields for the resource `event` and logs the waiting time as `action`
+        if the event was not granted immediately. Returns the event value.
+        """
+
+        start = self._env.now
+        value = yield event
+
+        waited = self._env.now - start
+        if waited > 0:
+            self.submit_action_log(action, waited)
+
+        return value
+
     def submit_action_log(self, action, duration, **kwargs):
         """
         Submits a log representing a completed `action` performed over time
@@ -170,32 +326,32 @@ class Agent(Object):
         AgentNotRegistered
         """
 
-        if self.env is None:
+        env = self._env
+        if env is None:
             raise AgentNotRegistered(self)
 
-        else:
-            payload = {
-                **kwargs,
-                "agent": str(self),
-                "action": action,
-                "duration": float(duration),
-            }
-
-            self.env._submit_log(payload, level="ACTION")
+        env._submit_action(self, action, float(duration), kwargs)
 
     def submit_debug_log(self, **kwargs):
         """
-        Submits a generic log used for debugging processes.
+        Submits a generic log used for debugging processes. Returns without
+        building a log if the environment does not keep debug logs (see
+        `Environment.log_level`). Callers with expensive log arguments can
+        check `self.env.debug` themselves.
 
         Raises
         ------
         AgentNotRegistered
         """
 
-        if self.env is None:
+        env = self._env
+        if env is None:
             raise AgentNotRegistered(self)
 
+        elif not env.debug:
+            return
+
         else:
             payload = {**kwargs, "agent": str(self)}
 
-            self.env._submit_log(payload, level="DEBUG")
+            env._submit_log(payload, level="DEBUG")
@@ -16,6 +16,8 @@ import _simpy
 from ._core import Constraint
 from .agent import Agent
 from .object import Object
+from .logs import LogView, LogStore, LogWriter
+from .timeline import Timeline
 from ._exceptions import (
     StateExhausted,
     WindowNotFound,
@@ -24,13 +26,25 @@ from ._exceptions import (
     RegistrationConflict,
 )
 
+_UNSET = object()
+
 
 class Environment(_simpy.Environment):
     """Base environment class."""
 
     _action_required = ["agent", "action", "duration"]
-
-    def __init__(self, name="Environment", state=None):
+    log_levels = {"DEBUG": 10, "ACTION": 20}
+
+    def __init__(
+        self,
+        name="Environment",
+        state=None,
+        sinks=None,
+        retain_logs=True,
+        trusted_agents=False,
+        batch_size=10000,
+        max_pending=4,
+    ):
         """
         Creates an instance of Environment.
 
@@ -42,24 +56,77 @@ class Environment(_simpy.Environment):
         state : array-like
             Time series representing the state of the environment throughout
             time or iterations.
+        sinks : list | None
+            List of `LogSink` instances that logs are streamed to. Logs are
+            written in batches on a background thread.
+        retain_logs : bool
+            Controls if logs are kept in memory. Disable to bound memory use
+            when logs are streamed to `sinks`.
+            Default: True
+        trusted_agents : bool
+            Skips validation of action logs submitted through
+            `Agent.submit_action_log`, which always provides the default
+            required keys. Leave disabled if `_action_required` is extended.
+            Default: False
+        batch_size : int
+            Number of logs collected before they are handed to the thread
+            writing them to `sinks`.
+            Default: 10000
+        max_pending : int
+            Maximum number of batches waiting to be written to `sinks`.
+            Submitting logs blocks while this limit is reached.
+            Default: 4
         """
 
         super().__init__()
 
         self.name = name
+        self._state_listeners = []
         self.state = state
-        self._logs = []
+        self._logs = LogStore()
+        self.retain_logs = retain_logs
+        self._writer = (
+            LogWriter(sinks, batch_size=batch_size, max_pending=max_pending)
+            if sinks
+            else None
+        )
+        self._log_handlers = []
+        if self._writer:
+            self._log_handlers.append(self._writer.submit)
+
+        self.trusted_agents = trusted_agents
+        self._required_keys = frozenset(self._action_required)
+        self._required_kwargs = self._required_keys.difference(LogStore.reserved)
+
+        self.log_level = "DEBUG"
+        self._untracked_agents = set()
+        self._untracked_actions = set()
+
         self._agents = {}
         self._objects = []
 
+        cls = type(self)
+        self._log_hooks_overridden = (
+            cls._submit_log is not Environment._submit_log
+            or cls._timestamp_log is not Environment._timestamp_log
+        )
+        self._custom_validation = (
+            cls._validate_action is not Environment._validate_action
+        )
+
     def __repr__(self):
         return self.name
 
     def _submit_log(self, payload, level):
         """
-        Accepts a log `payload`, inserts the `level` and appends it to
-        `self._logs`. If the level is 'ACTION', the action log is validated
-        with `self._validate_action` before being added to the log list.
+        Accepts a log `payload`, inserts the `level` and appends it to the log
+        store `self._logs` and passes it to the log handlers (sinks and
+        aggregators). If the level is 'ACTION', the action log is validated
+        with `self._validate_action` first.
+
+        Action logs of agents are submitted through `self._submit_action`,
+        which skips building a payload. If a subclass overrides this method
+        or `self._timestamp_log`, action logs are routed through them instead.
 
         Parameters
         ----------
@@ -68,16 +135,246 @@ class Environment(_simpy.Environment):
         level : str
         """
 
+        if level in self._dropped_levels:
+            return
+
         payload["level"] = level
         if level == "ACTION":
             self._validate_action(payload)
+            if not self._is_tracked(payload["agent"], payload["action"]):
+                return
 
         stamped = self._timestamp_log(payload)
-        self._logs.append(stamped)
+        if self.retain_logs:
+            self._logs.append(stamped)
+
+        for handler in self._log_handlers:
+            handler(stamped)
+
+    def _submit_action(self, agent, action, duration, kwargs):
+        """
+        Submits an action log of a registered `agent`. Used by
+        `Agent.submit_action_log`, where the payload keys are known, so only
+        required keys beyond the defaults are validated and validation is
+        skipped entirely if `self.trusted_agents` is enabled. A subclass
+        override of `self._validate_action` is called for every log of
+        untrusted agents.
+
+        The log is appended to the log store with the interned code of the
+        agent. A payload dict is only built if there are log handlers or if
+        a subclass overrides `self._submit_log` or `self._timestamp_log`, in
+        which case the log is passed to `self._submit_log`.
+
+        Parameters
+        ----------
+        agent : `Agent`
+        action : str
+            Performed action.
+        duration : float
+            Duration of action.
+        kwargs : dict
+            Additional log data.
+        """
+
+        name = str(agent)
+        if self._log_hooks_overridden:
+            payload = {**kwargs, "agent": name, "action": action, "duration": duration}
+            self._submit_log(payload, level="ACTION")
+            return
+
+        code = agent._log_code
+        if code is None or self._logs.agents[code] != name:
+            code = agent._log_code = self._logs.intern("agent", name)
+
+        if "ACTION" in self._dropped_levels or not self._is_tracked(name, action):
+            return
+
+        if not self.trusted_agents and (
+            self._custom_validation or not kwargs.keys() >= self._required_kwargs
+        ):
+            payload = {
+                **kwargs,
+                "agent": name,
+                "action": action,
+                "duration": duration,
+                "level": "ACTION",
+            }
+            self._validate_action(payload)
+
+        if self.retain_logs:
+            self._logs.append_action(self._now, duration, code, action, kwargs)
+
+        if self._log_handlers:
+            payload = {
+                **kwargs,
+                "agent": name,
+                "action": action,
+                "duration": duration,
+                "level": "ACTION",
+                "time": self._now,
+            }
+
+            for handler in self._log_handlers:
+                handler(payload)
+
+    @property
+    def log_level(self):
+        """
+        Returns the lowest log level that is kept. Logs with a lower rank in
+        `self.log_levels` are dropped when they are submitted. `self.debug`
+        indicates whether debug logs are kept.
+        """
+
+        return self._log_level
+
+    @log_level.setter
+    def log_level(self, level):
+        """
+        Sets the lowest log level that is kept.
+
+        Parameters
+        ----------
+        level : str
+            Key of `self.log_levels`.
+        """
+
+        if level not in self.log_levels:
+            raise ValueError(f"Log level '{level}' not recognized.")
+
+        threshold = self.log_levels[level]
+        self._log_level = level
+        self._dropped_levels = {k for k, v in self.log_levels.items() if v < threshold}
+        self.debug = "DEBUG" not in self._dropped_levels
+
+    def untrack(self, agent=_UNSET, action=_UNSET):
+        """
+        Stops keeping action logs of `agent` or of `action`. Action logs of
+        untracked agents or actions are dropped when they are submitted.
+
+        Parameters
+        ----------
+        agent : `Agent` | str
+        action : str
+        """
+
+        if agent is not _UNSET:
+            self._untracked_agents.add(str(agent))
+
+        if action is not _UNSET:
+            self._untracked_actions.add(str(action))
+
+    def track(self, agent=_UNSET, action=_UNSET):
+        """
+        Resumes keeping action logs of `agent` or of `action`. If neither is
+        passed, action logs of all agents and actions are kept again.
+
+        Parameters
+        ----------
+        agent : `Agent` | str
+        action : str
+        """
+
+        if agent is _UNSET and action is _UNSET:
+            self._untracked_agents.clear()
+            self._untracked_actions.clear()
+            return
+
+        if agent is not _UNSET:
+            self._untracked_agents.discard(str(agent))
+
+        if action is not _UNSET:
+            self._untracked_actions.discard(str(action))
+
+    def _is_tracked(self, agent, action):
+        """
+        Returns `False` if action logs of `agent` or `action` are dropped.
+
+        Parameters
+        ----------
+        agent : str
+        action : str
+        """
+
+        return not (
+            agent in self._untracked_agents or action in self._untracked_actions
+        )
+
+    def add_aggregator(self, aggregator):
+        """
+        Registers an online `aggregator` that is updated with every log that
+        is kept, including logs that are not retained in memory. Returns the
+        aggregator.
+
+        Parameters
+        ----------
+        aggregator : `marmot.stats.Aggregator` | callable
+        """
+
+        self._log_handlers.append(aggregator)
+        return aggregator
+
+    def remove_aggregator(self, aggregator):
+        """
+        Stops updating `aggregator`.
+
+        Parameters
+        ----------
+        aggregator : `marmot.stats.Aggregator` | callable
+        """
+
+        self._log_handlers.remove(aggregator)
+
+    def run(self, until=None):
+        """
+        Runs the simulation (see `_simpy.Environment.run`) and flushes any
+        log sinks afterwards. If the simulation raises, the logs up to the
+        error are still flushed, but an error from a log sink doesn't replace
+        the error of the simulation.
+        """
+
+        try:
+            value = super().run(until)
+
+        except BaseException:
+            try:
+                self.flush_logs()
+
+            except Exception:
+                pass
+
+            raise
+
+        self.flush_logs()
+        return value
+
+    def save_logs(self, path):
+        """
+        Writes the retained logs to a binary log archive at `path`, which can
+        be reopened with `marmot.logs.LogArchive`.
+
+        Parameters
+        ----------
+        path : str
+        """
+
+        self._logs.save(path)
+
+    def flush_logs(self):
+        """Writes any buffered logs to the log sinks."""
+
+        if self._writer:
+            self._writer.flush()
+
+    def close_logs(self):
+        """Flushes and closes the log sinks."""
+
+        if self._writer:
+            self._writer.close()
 
     def _validate_action(self, payload):
         """
-        Validates an action log payload against `self._action_required`.
+        Validates an action log payload against `self._action_required`. The
+        required keys are compiled into a set when the environment is created.
 
         Parameters
         ----------
@@ -85,8 +382,8 @@ class Environment(_simpy.Environment):
             Log data.
         """
 
-        missing = set(self._action_required).difference(set(payload.keys()))
-        if missing:
+        if not payload.keys() >= self._required_keys:
+            missing = self._required_keys.difference(payload)
             raise ActionMissingKeys(payload, missing)
 
     def _timestamp_log(self, payload):
@@ -113,7 +410,8 @@ class Environment(_simpy.Environment):
     @state.setter
     def state(self, data):
         """
-        Sets the state data for the environment.
+        Sets the state data for the environment and notifies the callables in
+        `self._state_listeners`, e.g. of a `GatedResource`.
 
         Parameters
         ----------
@@ -121,13 +419,14 @@ class Environment(_simpy.Environment):
         """
 
         if data is None:
-            self._state = np.recarray(shape=(0,), dtype=[])
-            return
+            data = np.recarray(shape=(0,), dtype=[])
 
         elif not isinstance(data, np.ndarray):
             raise TypeError(f"'state' data type '{type(data)}' not supported.")
 
         self._state = data
+        for listener in self._state_listeners:
+            listener()
 
     def find_operational_window(self, n, constraints):
         """
@@ -381,6 +680,7 @@ class Environment(_simpy.Environment):
             raise RegistrationConflict(self, agent)
 
         agent.env = self
+        agent._log_code = self._logs.intern("agent", str(agent))
         self._agents[str(agent)] = agent
 
     def _register_object(self, obj):
@@ -428,13 +728,66 @@ class Environment(_simpy.Environment):
         return self._objects
 
     @property
-    def logs(self):
-        """Returns list of all log payloads."""
+    def categories(self):
+        """
+        Returns the lookup tables of the integer codes used for agents,
+        actions and levels in `self.log_store.records`.
+        """
+
+        return self._logs.categories()
+
+    def timeline(self, delays=("Delay",)):
+        """
+        Returns a `Timeline` of the busy intervals of all agents, built from
+        the retained action logs.
+
+        Parameters
+        ----------
+        delays : tuple
+            Names of actions that represent delays.
+            Default: ('Delay',)
+        """
+
+        return Timeline(self._logs, delays=delays)
+
+    @property
+    def log_store(self):
+        """Returns the `LogStore` holding all logs."""
 
         return self._logs
 
+    @property
+    def logs(self):
+        """Returns a sequence of all log payloads, built on access."""
+
+        return LogView(self._logs)
+
     @property
     def actions(self):
         """Returns list of action log payloads."""
 
-        return [l for l in self._logs if l["level"] == "ACTION"]
+        return self._logs.to_dicts(self._logs.rows("level", "ACTION"))
+
+    def logs_for(self, agent):
+        """
+        Returns list of log payloads submitted by `agent`.
+
+        Parameters
+        ----------
+        agent : `Agent` | str
+        """
+
+        return self._logs.to_dicts(self._logs.rows("agent", str(agent)))
+
+    def logs_between(self, start, end):
+        """
+        Returns list of log payloads submitted at times `start` <= time <=
+        `end`.
+
+        Parameters
+        ----------
+        start : int | float
+        end : int | float
+        """
+
+        return self._logs.to_dicts(self._logs.between(start, end))
@@ -0,0 +1,862 @@
+"""Columnar log storage for marmot process modeling."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import csv
+import json
+import queue
+import struct
+import threading
+from bisect import bisect_left
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class LogStore:
+    """
+    Stores logs as rows of a growable NumPy structured array. The `time` and
+    `duration` of a log are kept as floats and its `agent`, `action` and
+    `level` are interned into integer codes, which index into the lookup
+    tables `self.agents`, `self.actions` and `self.levels`. Any other payload
+    keys are kept in sparse side columns.
+
+    The rows of each agent and each level are indexed as they are appended,
+    so they can be looked up without scanning the store.
+    """
+
+    dtype = np.dtype(
+        [
+            ("time", "<f8"),
+            ("duration", "<f8"),
+            ("agent", "<i4"),
+            ("action", "<i4"),
+            ("level", "<i4"),
+        ]
+    )
+    reserved = frozenset(("agent", "action", "duration", "level", "time"))
+    _columns = frozenset(("agent", "level", "time"))
+
+    def __init__(self, capacity=1024):
+        """
+        Creates an instance of `LogStore`.
+
+        Parameters
+        ----------
+        capacity : int
+            Number of rows allocated initially. The storage doubles in size
+            whenever it is full.
+        """
+
+        self._data = np.empty(max(int(capacity), 1), dtype=self.dtype)
+        self._size = 0
+
+        self.agents = []
+        self.actions = []
+        self.levels = []
+        self._codes = {"agent": {}, "action": {}, "level": {}}
+        self._tables = {
+            "agent": self.agents,
+            "action": self.actions,
+            "level": self.levels,
+        }
+
+        self._index = {"agent": [], "level": []}
+        self.extras = {}
+
+        # 'ACTION' is interned first so that its code is always 0.
+        for level in ("ACTION", "DEBUG"):
+            self.intern("level", level)
+
+    def __len__(self):
+        return self._size
+
+    def intern(self, category, value):
+        """
+        Returns the integer code of `value` in the lookup table of `category`,
+        adding it to the table if it is new.
+
+        Parameters
+        ----------
+        category : str
+            'agent', 'action' or 'level'.
+        value : hashable
+        """
+
+        codes = self._codes[category]
+        try:
+            return codes[value]
+
+        except KeyError:
+            table = self._tables[category]
+            code = codes[value] = len(table)
+            table.append(value)
+            if category in self._index:
+                self._index[category].append([])
+
+            return code
+
+    def code(self, category, value):
+        """
+        Returns the integer code of `value` in the lookup table of `category`
+        or -1 if it has not been logged.
+
+        Parameters
+        ----------
+        category : str
+            'agent', 'action' or 'level'.
+        value : hashable
+        """
+
+        return self._codes[category].get(value, -1)
+
+    def append(self, payload):
+        """
+        Appends a log `payload` as a new row.
+
+        Parameters
+        ----------
+        payload : dict
+            Log data. Keys other than `self.reserved` are stored in side
+            columns.
+        """
+
+        n = self._size
+        if n == len(self._data):
+            self._grow()
+
+        level = payload["level"]
+        level_code = self.intern("level", level)
+        agent = payload.get("agent", None)
+        agent_code = -1 if agent is None else self.intern("agent", agent)
+
+        if level == "ACTION":
+            action_code = self.intern("action", payload["action"])
+            duration = payload["duration"]
+
+        else:
+            action_code = -1
+            duration = np.nan
+
+        self._data[n] = (payload["time"], duration, agent_code, action_code, level_code)
+        self._index["level"][level_code].append(n)
+        if agent_code >= 0:
+            self._index["agent"][agent_code].append(n)
+
+        skip = self.reserved if action_code >= 0 else self._columns
+        for k, v in payload.items():
+            if k not in skip:
+                self._append_extra(k, n, v)
+
+        self._size = n + 1
+        return n
+
+    def append_action(self, time, duration, agent, action, extras):
+        """
+        Appends an action log without building a payload dict.
+
+        Parameters
+        ----------
+        time : int | float
+        duration : float
+        agent : int
+            Interned agent code.
+        action : str
+            Action name.
+        extras : dict
+            Additional log data. Reserved keys are ignored.
+        """
+
+        n = self._size
+        if n == len(self._data):
+            self._grow()
+
+        self._data[n] = (time, duration, agent, self.intern("action", action), 0)
+        self._index["level"][0].append(n)
+        self._index["agent"][agent].append(n)
+
+        for k, v in extras.items():
+            if k not in self.reserved:
+                self._append_extra(k, n, v)
+
+        self._size = n + 1
+        return n
+
+    def categories(self):
+        """Returns the lookup tables of the interned codes."""
+
+        return {"agent": self.agents, "action": self.actions, "level": self.levels}
+
+    def rows(self, category, value):
+        """
+        Returns the indices of the rows logged with `value` for `category`.
+
+        Parameters
+        ----------
+        category : str
+            'agent' or 'level'.
+        value : hashable
+        """
+
+        code = self.code(category, value)
+        if code < 0:
+            return np.empty(0, dtype=int)
+
+        return np.array(self._index[category][code], dtype=int)
+
+    def between(self, start, end):
+        """
+        Returns the range of rows logged at times `start` <= time <= `end`.
+        Relies on rows being appended in chronological order.
+
+        Parameters
+        ----------
+        start : int | float
+        end : int | float
+        """
+
+        time = self.records["time"]
+        lo = np.searchsorted(time, start, side="left")
+        hi = np.searchsorted(time, end, side="right")
+        return range(lo, max(lo, hi))
+
+    def _append_extra(self, key, row, value):
+        """Appends `value` of `row` to the side column `key`."""
+
+        try:
+            rows, values = self.extras[key]
+
+        except KeyError:
+            rows, values = self.extras[key] = ([], [])
+
+        rows.append(row)
+        values.append(value)
+
+    def _grow(self):
+        """Doubles the allocated rows."""
+
+        data = np.empty(2 * len(self._data), dtype=self.dtype)
+        data[: self._size] = self._data[: self._size]
+        self._data = data
+
+    @property
+    def records(self):
+        """
+        Returns the stored rows as a structured array. The array is a view
+        into the storage and is not copied.
+        """
+
+        return self._data[: self._size]
+
+    def column(self, key):
+        """
+        Returns the side column `key` as an object array aligned with
+        `self.records`. Rows without a value are `None`.
+
+        Parameters
+        ----------
+        key : str
+        """
+
+        out = np.full(self._size, None, dtype=object)
+        try:
+            rows, values = self.extras[key]
+
+        except KeyError:
+            return out
+
+        out[rows] = values
+        return out
+
+    def row(self, i):
+        """
+        Returns row `i` as a log payload dict.
+
+        Parameters
+        ----------
+        i : int
+        """
+
+        if i < 0:
+            i += self._size
+
+        if not 0 <= i < self._size:
+            raise IndexError("Log index out of range.")
+
+        time, duration, agent, action, level = self._data[i].item()
+
+        payload = {}
+        for k, (rows, values) in self.extras.items():
+            j = bisect_left(rows, i)
+            if j < len(rows) and rows[j] == i:
+                payload[k] = values[j]
+
+        if agent >= 0:
+            payload["agent"] = self.agents[agent]
+
+        if action >= 0:
+            payload["action"] = self.actions[action]
+            payload["duration"] = duration
+
+        payload["level"] = self.levels[level]
+        payload["time"] = time
+        return payload
+
+    def to_dicts(self, rows=None):
+        """
+        Returns a list of log payload dicts.
+
+        Parameters
+        ----------
+        rows : array-like | None
+            Row indices to return. Default: all rows.
+        """
+
+        if rows is None:
+            rows = range(self._size)
+
+        return [self.row(int(i)) for i in rows]
+
+    def save(self, path):
+        """
+        Writes the store to a binary log archive at `path` (see
+        `LogArchive`).
+
+        Parameters
+        ----------
+        path : str
+        """
+
+        writer = _ArchiveWriter(path)
+        writer.write(self.records)
+        writer.close(self.categories(), self.extras, [[0, len(self), None]])
+
+
+class LogView(Sequence):
+    """
+    Read-only sequence of log payload dicts that are materialized from the
+    rows of a `LogStore` when they are accessed.
+    """
+
+    def __init__(self, store, rows=None):
+        """
+        Creates an instance of `LogView`.
+
+        Parameters
+        ----------
+        store : `LogStore`
+        rows : array-like | None
+            Row indices included in the view. Default: all rows, including
+            rows appended after the view was created.
+        """
+
+        self._store = store
+        self._rows = rows
+
+    def __len__(self):
+        if self._rows is None:
+            return len(self._store)
+
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if self._rows is None:
+            return self._store.row(i)
+
+        return self._store.row(int(self._rows[i]))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, LogView)):
+            return list(self) == list(other)
+
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def expand_segments(logs, delay="Delay"):
+    """
+    Returns a list of log payloads where each compact action log of a
+    suspendable task (see `Agent.task`) is replaced by one action log per
+    work or delay segment, as if the task had been run without `compact`.
+    Other logs are returned unchanged.
+
+    Parameters
+    ----------
+    logs : iterable
+        Log payloads, e.g. `Environment.actions`.
+    delay : str
+        Action name of delay segments.
+        Default: 'Delay'
+    """
+
+    expanded = []
+    for payload in logs:
+        segments = payload.get("segments", None)
+        if segments is None or payload["level"] != "ACTION":
+            expanded.append(payload)
+            continue
+
+        base = {k: v for k, v in payload.items() if k != "segments"}
+        ends = payload["time"] - payload["duration"] + np.cumsum(segments)
+        last = len(segments) - 1
+        for i, (duration, end) in enumerate(zip(segments, ends)):
+            expanded.append(
+                {
+                    **base,
+                    "action": base["action"] if (last - i) % 2 == 0 else delay,
+                    "duration": float(duration),
+                    "time": float(end),
+                }
+            )
+
+    return expanded
+
+
+def _encode(obj):
+    """JSON encoder for values that are not natively serializable."""
+
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+
+    return str(obj)
+
+
+class LogSink:
+    """
+    Base class for log sinks. A sink receives batches of log payload dicts
+    from a `LogWriter` and persists them.
+    """
+
+    def write(self, batch):
+        """
+        Writes a `batch` of log payloads.
+
+        Parameters
+        ----------
+        batch : list
+            List of log payload dicts.
+        """
+
+        raise NotImplementedError()
+
+    def close(self):
+        """Releases any resources held by the sink."""
+
+        pass
+
+
+class JsonLinesSink(LogSink):
+    """Writes each log payload as a line of JSON."""
+
+    def __init__(self, path):
+        """
+        Creates an instance of `JsonLinesSink`.
+
+        Parameters
+        ----------
+        path : str
+            Output file. Existing files are overwritten.
+        """
+
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, batch):
+        self._file.write("".join(json.dumps(p, default=_encode) + "\n" for p in batch))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSink(LogSink):
+    """
+    Writes log payloads as rows of a CSV file with a fixed set of columns.
+    Payload keys that are not a column are dropped.
+    """
+
+    fields = ("time", "level", "agent", "action", "duration")
+
+    def __init__(self, path, fields=None):
+        """
+        Creates an instance of `CsvSink`.
+
+        Parameters
+        ----------
+        path : str
+            Output file. Existing files are overwritten.
+        fields : list | None
+            Column names. Default: `CsvSink.fields`.
+        """
+
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(
+            self._file, fields or self.fields, extrasaction="ignore"
+        )
+        self._writer.writeheader()
+
+    def write(self, batch):
+        self._writer.writerows(batch)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class LogWriter:
+    """
+    Buffers log payloads and hands them to one or more `LogSink` instances in
+    batches on a background thread. At most `max_pending` batches wait for the
+    thread at any time, which bounds the memory used by the writer.
+    """
+
+    _stop = object()
+
+    def __init__(self, sinks, batch_size=10000, max_pending=4):
+        """
+        Creates an instance of `LogWriter` and starts its thread.
+
+        Parameters
+        ----------
+        sinks : list
+            List of `LogSink` instances.
+        batch_size : int
+            Number of payloads collected before a batch is handed off.
+        max_pending : int
+            Maximum number of batches waiting to be written. Submitting logs
+            blocks while this limit is reached.
+        """
+
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self._buffer = []
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="marmot-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, payload):
+        """
+        Adds `payload` to the buffer, handing the buffer off to the writer
+        thread once it holds `self.batch_size` payloads.
+
+        Parameters
+        ----------
+        payload : dict
+        """
+
+        self._buffer.append(payload)
+        if len(self._buffer) >= self.batch_size:
+            self._handoff()
+
+    def _handoff(self):
+        """Queues the current buffer for writing."""
+
+        if self._error is not None:
+            raise self._error
+
+        if self._buffer:
+            self._queue.put(self._buffer)
+            self._buffer = []
+
+    def _run(self):
+        """Writer thread loop."""
+
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is self._stop:
+                    return
+
+                if self._error is None:
+                    for sink in self.sinks:
+                        sink.write(batch)
+
+            except Exception as e:
+                self._error = e
+
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Writes all buffered payloads and waits for the writer thread."""
+
+        self._handoff()
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Flushes the writer, stops its thread and closes all sinks."""
+
+        if not self._thread.is_alive():
+            return
+
+        try:
+            self.flush()
+
+        finally:
+            self._queue.put(self._stop)
+            self._thread.join()
+            for sink in self.sinks:
+                sink.close()
+
+
+class _ArchiveWriter:
+    """
+    Writes a binary log archive. The file starts with a fixed size header,
+    followed by the rows as fixed-width records of `LogStore.dtype` and a JSON
+    table of the category lookup tables, side columns and run boundaries.
+    The table is written last, so rows can be streamed to the file.
+    """
+
+    magic = b"MARMOTLG"
+    version = 1
+    header = struct.Struct("<8sIQQQQ")
+    offset = 64
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * self.offset)
+
+    def write(self, records):
+        records.astype(LogStore.dtype, copy=False).tofile(self._file)
+        self.rows += len(records)
+
+    def close(self, categories, extras, runs):
+        table = {
+            "categories": {k: [str(v) for v in t] for k, t in categories.items()},
+            "extras": {k: [list(r), list(v)] for k, (r, v) in extras.items()},
+            "runs": runs,
+        }
+
+        encoded = json.dumps(table, default=_encode).encode("utf-8")
+        position = self._file.tell()
+        self._file.write(encoded)
+        self._file.seek(0)
+        self._file.write(
+            self.header.pack(
+                self.magic, self.version, self.rows, self.offset, position, len(encoded)
+            )
+        )
+        self._file.close()
+
+
+class LogArchive(LogStore):
+    """
+    Read-only `LogStore` backed by a binary log archive. The rows are memory
+    mapped with `np.memmap`, so opening an archive only reads its header and
+    lookup tables. Archives are written with `LogStore.save`,
+    `Environment.save_logs`, an `ArchiveSink` or `LogArchive.concatenate`.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the archive at `path`.
+
+        Parameters
+        ----------
+        path : str
+        """
+
+        self.path = path
+        with open(path, "rb") as f:
+            header = _ArchiveWriter.header
+            magic, version, rows, offset, position, length = header.unpack(
+                f.read(header.size)
+            )
+
+            if magic != _ArchiveWriter.magic:
+                raise ValueError(f"'{path}' is not a marmot log archive.")
+
+            if version != _ArchiveWriter.version:
+                raise ValueError(f"Log archive version {version} not supported.")
+
+            f.seek(position)
+            table = json.loads(f.read(length).decode("utf-8"))
+
+        if rows:
+            self._data = np.memmap(
+                path, dtype=self.dtype, mode="r", offset=offset, shape=(rows,)
+            )
+
+        else:
+            self._data = np.empty(0, dtype=self.dtype)
+
+        self._size = rows
+        categories = table["categories"]
+        self.agents = categories["agent"]
+        self.actions = categories["action"]
+        self.levels = categories["level"]
+        self._tables = categories
+        self._codes = {
+            k: {v: i for i, v in enumerate(t)} for k, t in categories.items()
+        }
+        self.extras = {k: (r, v) for k, (r, v) in table["extras"].items()}
+        self.runs = table["runs"]
+
+    def append(self, payload):
+        raise TypeError("Log archives are read-only.")
+
+    def append_action(self, time, duration, agent, action, extras):
+        raise TypeError("Log archives are read-only.")
+
+    def rows(self, category, value):
+        """
+        Returns the indices of the rows logged with `value` for `category`.
+
+        Parameters
+        ----------
+        category : str
+            'agent', 'action' or 'level'.
+        value : hashable
+        """
+
+        code = self.code(category, value)
+        if code < 0:
+            return np.empty(0, dtype=int)
+
+        return np.flatnonzero(self.records[category] == code)
+
+    def between(self, start, end):
+        """
+        Returns the indices of the rows logged at times `start` <= time <=
+        `end`. Each run in the archive is searched separately.
+
+        Parameters
+        ----------
+        start : int | float
+        end : int | float
+        """
+
+        time = self.records["time"]
+        found = []
+        for lo, hi, _ in self.runs:
+            i = lo + np.searchsorted(time[lo:hi], start, side="left")
+            j = lo + np.searchsorted(time[lo:hi], end, side="right")
+            found.append(np.arange(i, max(i, j)))
+
+        return np.concatenate(found) if found else np.empty(0, dtype=int)
+
+    def run(self, i):
+        """
+        Returns the rows of run `i` as a structured array.
+
+        Parameters
+        ----------
+        i : int
+        """
+
+        lo, hi, _ = self.runs[i]
+        return self.records[lo:hi]
+
+    @staticmethod
+    def concatenate(paths, path, chunk=1000000):
+        """
+        Concatenates the archives at `paths`, e.g. of replicate runs, into a
+        new archive at `path`. Codes are remapped to a combined set of lookup
+        tables and each input becomes a run of the new archive. Returns the
+        opened archive.
+
+        Parameters
+        ----------
+        paths : list
+            Archives to concatenate.
+        path : str
+            Output archive.
+        chunk : int
+            Number of rows copied at a time.
+        """
+
+        combined = LogStore(capacity=1)
+        extras = {}
+        runs = []
+        writer = _ArchiveWriter(path)
+
+        try:
+            for source in paths:
+                archive = LogArchive(source)
+                offset = writer.rows
+                maps = {
+                    k: np.array([combined.intern(k, v) for v in t] + [-1], dtype="i4")
+                    for k, t in archive.categories().items()
+                }
+
+                for lo in range(0, len(archive), chunk):
+                    records = np.array(archive.records[lo : lo + chunk])
+                    for k, m in maps.items():
+                        records[k] = m[records[k]]
+
+                    writer.write(records)
+
+                for k, (r, v) in archive.extras.items():
+                    rows, values = extras.setdefault(k, ([], []))
+                    rows.extend(offset + i for i in r)
+                    values.extend(v)
+
+                for lo, hi, name in archive.runs:
+                    runs.append([offset + lo, offset + hi, name or str(source)])
+
+                del archive
+
+        finally:
+            writer.close(combined.categories(), extras, runs)
+
+        return LogArchive(path)
+
+
+class ArchiveSink(LogSink):
+    """
+    Streams log payloads to a binary log archive (see `LogArchive`). Only
+    the time, duration, agent, action and level of each log are written; side
+    columns are dropped to keep memory use bounded.
+    """
+
+    def __init__(self, path):
+        """
+        Creates an instance of `ArchiveSink`.
+
+        Parameters
+        ----------
+        path : str
+            Output file. Existing files are overwritten.
+        """
+
+        self.path = path
+        self._tables = LogStore(capacity=1)
+        self._writer = _ArchiveWriter(path)
+
+    def write(self, batch):
+        intern = self._tables.intern
+        records = np.array(
+            [
+                (
+                    p["time"],
+                    p.get("duration", np.nan) if p["level"] == "ACTION" else np.nan,
+                    -1 if p.get("agent") is None else intern("agent", p["agent"]),
+                    intern("action", p["action"]) if p["level"] == "ACTION" else -1,
+                    intern("level", p["level"]),
+                )
+                for p in batch
+            ],
+            dtype=LogStore.dtype,
+        )
+        self._writer.write(records)
+
+    def close(self):
+        rows = self._writer.rows
+        self._writer.close(self._tables.categories(), {}, [[0, rows, None]])
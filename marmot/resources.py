@@ -0,0 +1,174 @@
+"""Shared resources for marmot process modeling."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+from math import ceil
+
+import numpy as np
+
+import _simpy
+from _simpy.core import BoundClass
+
+
+class GatedRequest(_simpy.resources.resource.Request):
+    """Request of a `GatedResource`."""
+
+    def cancel(self):
+        """
+        Cancels the request and withdraws the scheduled opening of the
+        resource if no requests are held anymore.
+        """
+
+        super().cancel()
+        self.resource._withdraw_opening()
+
+
+class GatedResource(_simpy.Resource):
+    """
+    `Resource` that is only available while `constraints` on the state of the
+    environment are met, e.g. a port that closes when wind speeds or wave
+    heights exceed its limits. Requests made while the resource is closed are
+    held in the queue and granted once it opens again. Current users are not
+    affected by a closure.
+
+    The open steps of the state are computed with NumPy once and again
+    whenever `Environment.state` is replaced. While requests are held, a
+    single timeout is scheduled for the next opening, so no polling process is
+    needed. The timeout is cancelled once no requests are held anymore, so a
+    closed resource without waiting requests doesn't keep the simulation
+    running.
+
+    The resource is open at time `t` if the constraints are met at
+    `ceil(t)`, the first step of `Environment.state`. It is always open if the
+    environment has no state and closed after the state is exhausted.
+    """
+
+    def __init__(self, env, constraints, capacity=1):
+        """
+        Creates an instance of `GatedResource`.
+
+        Parameters
+        ----------
+        env : `Environment`
+        constraints : dict
+            Dictionary of `Constraints` applied to `env.state` columns
+            Format:
+            - Key: name corresponding to column in `env.state`.
+            - Value: `Constraint` to be applied.
+        capacity : int
+            Number of usage slots.
+            Default: 1
+        """
+
+        super().__init__(env, capacity)
+
+        self._constraints = constraints
+        self._opening = None
+        self._update_state()
+        env._state_listeners.append(self._update_state)
+
+    request = BoundClass(GatedRequest)
+    """Request a usage slot."""
+
+    def _update_state(self):
+        """
+        Computes the open steps of the current state of the environment and
+        reschedules a pending opening.
+        """
+
+        env = self._env
+        self.constraints = env._find_valid_constraints(**self._constraints)
+        if env._state.size > 0:
+            allowed = env._apply_constraints(env._state, self.constraints)
+            self._open = np.flatnonzero(allowed)
+
+        else:
+            self._open = None
+
+        if self._opening is not None:
+            self._opening.cancel()
+            self._opening = None
+            self._trigger_put(None)
+
+    @property
+    def is_open(self):
+        """Returns `True` if the resource is open at the current time."""
+
+        if self._open is None:
+            return True
+
+        step = ceil(self._env.now)
+        i = np.searchsorted(self._open, step)
+        return i < len(self._open) and self._open[i] == step
+
+    def next_opening(self):
+        """
+        Returns the time at which the resource opens next, the current time
+        if it is open or `None` if it doesn't open again.
+        """
+
+        if self._open is None:
+            return self._env.now
+
+        now = self._env.now
+        i = np.searchsorted(self._open, ceil(now))
+        if i == len(self._open):
+            return None
+
+        return max(int(self._open[i]), now)
+
+    def _admits(self, entry):
+
+        if not self.is_open:
+            self._schedule_opening()
+            return False
+
+        return super()._admits(entry)
+
+    def _do_put(self, event):
+
+        if self.is_open:
+            super()._do_put(event)
+            return event.triggered
+
+        self._schedule_opening()
+        return False
+
+    def _trigger_put(self, get_event):
+
+        super()._trigger_put(get_event)
+        self._withdraw_opening()
+
+    def _held(self):
+        """Returns `True` if requests are waiting for the resource."""
+
+        if self.put_queue:
+            return True
+
+        return bool(self._waitlists) and self._reservation() is not None
+
+    def _schedule_opening(self):
+        """Schedules a single timeout for the next opening."""
+
+        if self._opening is None:
+            opening = self.next_opening()
+            if opening is not None:
+                self._opening = self._env.timeout(opening - self._env.now)
+                self._opening.callbacks.append(self._reopen)
+
+    def _withdraw_opening(self):
+        """Cancels the scheduled opening if no requests are held anymore."""
+
+        if self._opening is not None and not self._held():
+            self._opening.cancel()
+            self._opening = None
+
+    def _reopen(self, event):
+        """Grants the held requests once the resource opens."""
+
+        self._opening = None
+        self._trigger_put(None)
@@ -0,0 +1,165 @@
+"""Online aggregation of marmot logs."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+from .logs import expand_segments
+
+
+class Aggregator:
+    """
+    Base class for online log aggregators. An aggregator is registered with
+    `Environment.add_aggregator` and called with every log payload that is
+    kept by the environment, whether or not the raw logs are retained.
+    Compact logs of suspendable tasks are aggregated per segment.
+    """
+
+    def __call__(self, payload):
+        """
+        Updates the aggregate with a log `payload`.
+
+        Parameters
+        ----------
+        payload : dict
+        """
+
+        raise NotImplementedError()
+
+    def results(self):
+        """Returns the aggregated results."""
+
+        raise NotImplementedError()
+
+
+class ActionStats(Aggregator):
+    """
+    Aggregates the count, total, mean, minimum and maximum duration of action
+    logs, grouped by one or more payload keys.
+    """
+
+    def __init__(self, by=("agent", "action")):
+        """
+        Creates an instance of `ActionStats`.
+
+        Parameters
+        ----------
+        by : str | tuple
+            Payload key(s) to group by.
+            Default: ('agent', 'action')
+        """
+
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        self._groups = {}
+
+    def __call__(self, payload):
+
+        if payload["level"] != "ACTION":
+            return
+
+        if "segments" in payload:
+            for segment in expand_segments((payload,)):
+                self(segment)
+
+            return
+
+        key = tuple(payload.get(k, None) for k in self.by)
+        duration = payload["duration"]
+        try:
+            group = self._groups[key]
+
+        except KeyError:
+            self._groups[key] = [1, duration, duration, duration]
+            return
+
+        group[0] += 1
+        group[1] += duration
+        if duration < group[2]:
+            group[2] = duration
+
+        if duration > group[3]:
+            group[3] = duration
+
+    def results(self):
+        """
+        Returns dict of results per group. Keys are single values if grouped
+        by a single key, tuples otherwise.
+        """
+
+        single = len(self.by) == 1
+        return {
+            (k[0] if single else k): {
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "min": low,
+                "max": high,
+            }
+            for k, (count, total, low, high) in self._groups.items()
+        }
+
+
+class AgentSummary(Aggregator):
+    """
+    Aggregates the total delay and working time of each agent. Actions named
+    in `delays` count as delay, all other actions as working time.
+    """
+
+    def __init__(self, delays=("Delay",)):
+        """
+        Creates an instance of `AgentSummary`.
+
+        Parameters
+        ----------
+        delays : tuple
+            Names of actions that represent delays.
+            Default: ('Delay',)
+        """
+
+        self.delays = frozenset(delays)
+        self._agents = {}
+
+    def __call__(self, payload):
+
+        if payload["level"] != "ACTION":
+            return
+
+        if "segments" in payload:
+            for segment in expand_segments((payload,)):
+                self(segment)
+
+            return
+
+        try:
+            agent = self._agents[payload["agent"]]
+
+        except KeyError:
+            agent = self._agents[payload["agent"]] = [0, 0.0, 0.0, 0.0]
+
+        duration = payload["duration"]
+        agent[0] += 1
+        if payload["action"] in self.delays:
+            agent[1] += duration
+
+        else:
+            agent[2] += duration
+
+        if duration > agent[3]:
+            agent[3] = duration
+
+    def results(self):
+        """Returns dict of results per agent."""
+
+        return {
+            k: {
+                "count": count,
+                "delay": delay,
+                "working": working,
+                "total": delay + working,
+                "mean": (delay + working) / count,
+                "max": high,
+            }
+            for k, (count, delay, working, high) in self._agents.items()
+        }
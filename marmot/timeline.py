@@ -0,0 +1,182 @@
+"""Vectorized reconstruction of agent timelines from marmot logs."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import numpy as np
+
+
+class Timeline:
+    """
+    Busy intervals of every agent, reconstructed from the action logs of a
+    `LogStore`. Each action log marks the end of an interval of length
+    `duration`. Intervals are sorted by agent and start time with NumPy, so
+    no Python loop over the logs is needed. Compact logs of suspendable tasks
+    are expanded into one interval per segment.
+    """
+
+    def __init__(self, store, delays=("Delay",)):
+        """
+        Creates an instance of `Timeline`.
+
+        Parameters
+        ----------
+        store : `LogStore`
+            Log store, e.g. `Environment.log_store`.
+        delays : tuple
+            Names of actions that represent delays rather than work.
+            Default: ('Delay',)
+        """
+
+        self.agents = list(store.agents)
+        self.actions = list(store.actions)
+
+        level = store.code("level", "ACTION")
+        rows = np.flatnonzero(store.records["level"] == level)
+        records = store.records[rows]
+
+        end = records["time"]
+        start = end - records["duration"]
+        agent = records["agent"]
+        action = records["action"]
+
+        if "segments" in store.extras:
+            if "Delay" not in self.actions:
+                self.actions.append("Delay")
+
+            compact, values = store.extras["segments"]
+            found = np.isin(rows, compact)
+            if found.any():
+                segments = [values[i] for i in np.searchsorted(compact, rows[found])]
+                expanded = self._expand(
+                    records[found], segments, self.actions.index("Delay")
+                )
+
+                end, start, agent, action = (
+                    np.concatenate([a[~found], b])
+                    for a, b in zip((end, start, agent, action), expanded)
+                )
+
+        order = np.lexsort((start, agent))
+
+        self.start = start[order]
+        self.end = end[order]
+        self.agent = agent[order]
+        self.action = action[order]
+
+        delay_codes = [self.actions.index(d) for d in delays if d in self.actions]
+        self.delay = np.isin(self.action, delay_codes)
+
+        self._bounds = np.searchsorted(self.agent, np.arange(len(self.agents) + 1))
+
+    @staticmethod
+    def _expand(records, segments, delay):
+        """
+        Returns the `end`, `start`, `agent` and `action` arrays of the segments
+        of compact action `records`. The last segment of each record is work,
+        preceded by alternating delay and work segments.
+        """
+
+        lengths = np.array([len(s) for s in segments])
+        durations = np.concatenate(segments).astype(float)
+        owner = np.repeat(np.arange(len(records)), lengths)
+
+        first = np.cumsum(lengths) - lengths
+        elapsed = np.cumsum(durations)
+        elapsed -= (elapsed - durations)[first][owner]
+
+        end = (records["time"] - records["duration"])[owner] + elapsed
+        from_last = (first + lengths - 1)[owner] - np.arange(len(durations))
+        action = np.where(from_last % 2 == 0, records["action"][owner], delay)
+        return end, end - durations, records["agent"][owner], action
+
+    def __len__(self):
+        return len(self.start)
+
+    def _code(self, agent):
+        """Returns the code of `agent`."""
+
+        try:
+            return self.agents.index(str(agent))
+
+        except ValueError:
+            raise KeyError(f"Agent '{agent}' not found in logs.")
+
+    def intervals(self, agent):
+        """
+        Returns the intervals of `agent` as a dict of `start`, `end` and
+        `action` arrays ordered by start time. Actions are decoded to names.
+
+        Parameters
+        ----------
+        agent : `Agent` | str
+        """
+
+        code = self._code(agent)
+        lo, hi = self._bounds[code], self._bounds[code + 1]
+        return {
+            "start": self.start[lo:hi],
+            "end": self.end[lo:hi],
+            "action": np.array(self.actions, dtype=object)[self.action[lo:hi]],
+        }
+
+    def utilization(self, start=None, end=None, include_delays=False):
+        """
+        Returns the fraction of time each agent spent on actions between
+        `start` and `end`. Intervals are clipped to that range. Overlapping
+        intervals of the same agent are counted separately.
+
+        Parameters
+        ----------
+        start : int | float | None
+            Default: earliest start time in the logs.
+        end : int | float | None
+            Default: latest end time in the logs.
+        include_delays : bool
+            Counts delays as busy time.
+            Default: False
+        """
+
+        if not len(self):
+            return {}
+
+        start = self.start.min() if start is None else start
+        end = self.end.max() if end is None else end
+        horizon = end - start
+        if horizon <= 0:
+            raise ValueError("'end' must be greater than 'start'.")
+
+        busy = np.clip(self.end, start, end) - np.clip(self.start, start, end)
+        if not include_delays:
+            busy = np.where(self.delay, 0.0, busy)
+
+        totals = np.bincount(self.agent, weights=busy, minlength=len(self.agents))
+        return {a: t / horizon for a, t in zip(self.agents, totals)}
+
+    def concurrency(self, include_delays=True):
+        """
+        Returns the number of concurrently active intervals over time as a
+        tuple of `times` and `counts` arrays, where `counts[i]` applies from
+        `times[i]` until `times[i + 1]`. Intervals that end at the same time
+        another starts do not overlap.
+
+        Parameters
+        ----------
+        include_delays : bool
+            Counts delays as active intervals.
+            Default: True
+        """
+
+        mask = slice(None) if include_delays else ~self.delay
+        starts, ends = self.start[mask], self.end[mask]
+
+        times = np.concatenate([ends, starts])
+        steps = np.concatenate([-np.ones(len(ends)), np.ones(len(starts))])
+        order = np.lexsort((steps, times))
+
+        times, counts = times[order], np.cumsum(steps[order])
+        last = np.append(times[1:] != times[:-1], True)
+        return times[last], counts[last].astype(int)
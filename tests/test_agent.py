@@ -9,7 +9,9 @@ __status__ = "Development"
 import pytest
 
 import _simpy
-from marmot import lt, true
+from marmot import Environment, lt, true
+from marmot.logs import expand_segments
+from marmot.stats import ActionStats
 from marmot._exceptions import (
     StateExhausted,
     WindowNotFound,
@@ -170,3 +172,73 @@ def test_suspendable_task(env, ExampleAgent):
         env.run()
 
         assert excinfo.value.agent == agent
+
+
+def test_compact_suspendable_task(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+
+    compact = Environment(state=env.state)
+    stats = env.add_aggregator(ActionStats())
+    compact_stats = compact.add_aggregator(ActionStats())
+    constraints = {"temp": lt(100), "workday": true()}
+    agent.task("Task", 8, constraints=constraints, suspendable=True)
+    env.run()
+    expected = env.actions
+
+    agent = ExampleAgent()
+    compact.register(agent)
+
+    agent.task("Task", 8, constraints=constraints, suspendable=True, compact=True)
+    compact.run()
+    assert compact.now == env.now
+    assert len(compact.actions) == 1
+    assert list(compact.actions[0]["segments"]) == [d["duration"] for d in expected]
+
+    assert expand_segments(compact.actions) == expected
+    assert compact.timeline().intervals(agent)["end"].tolist() == [
+        d["time"] for d in expected
+    ]
+    assert compact_stats.results() == stats.results()
+
+
+def test_resource_helpers(env, ExampleAgent):
+
+    crane = _simpy.Resource(env, capacity=1)
+    yard = _simpy.Store(env)
+    first, second = ExampleAgent("First"), ExampleAgent("Second")
+    env.register(first)
+    env.register(second)
+
+    def lift(agent, duration):
+        request = yield agent.request(crane)
+        yield env.timeout(duration)
+        crane.release(request)
+        yield agent.put(yard, str(agent))
+
+    env.process(lift(first, 5))
+    env.process(lift(second, 3))
+    env.run(until=1)
+
+    assert env.is_scheduled(second)
+    with pytest.raises(AgentAlreadyScheduled):
+        second.pause(1)
+
+    env.run()
+    assert env.now == 8
+    assert yard.items == ["First", "Second"]
+    assert env.actions == [
+        {
+            "agent": "Second",
+            "action": "Wait",
+            "duration": 5.0,
+            "level": "ACTION",
+            "time": 5,
+        }
+    ]
+    assert not env.scheduled_agents
+
+    item = second.get(yard)
+    env.run()
+    assert item.value == "First"
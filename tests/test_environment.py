@@ -300,3 +300,34 @@ def test_find_operational_window(env, min_env):
     )
     with pytest.raises(WindowNotFound):
         env.find_operational_window(8, constraints={"temp": lt(100), "workday": true()})
+
+
+def test_action_log_validation(state, ExampleAgent):
+    class LocationEnvironment(Environment):
+        _action_required = ["agent", "action", "duration", "location"]
+
+    env = LocationEnvironment(state=state)
+    agent = ExampleAgent()
+    env.register(agent)
+
+    agent.submit_action_log("Move", 1, location="Port")
+    assert env.actions[-1]["location"] == "Port"
+
+    with pytest.raises(ActionMissingKeys) as excinfo:
+        agent.submit_action_log("Move", 1)
+
+    assert excinfo.value.missing == {"location"}
+
+
+def test_trusted_agents(state, ExampleAgent):
+
+    env = Environment(state=state, trusted_agents=True)
+    env._required_keys = frozenset(["agent", "action", "duration", "location"])
+
+    agent = ExampleAgent()
+    env.register(agent)
+    agent.submit_action_log("Move", 1)
+    assert env.actions[-1]["action"] == "Move"
+
+    with pytest.raises(ActionMissingKeys):
+        env._submit_log({"agent": "Test Agent", "action": "Move"}, level="ACTION")
@@ -0,0 +1,186 @@
+"""Tests for the marmot modifications to `_simpy` events."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2019, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import pytest
+
+import _simpy
+
+
+def test_cancel_timeout():
+
+    env = _simpy.Environment()
+    fired = []
+
+    timeout = env.timeout(5, agent="A")
+    timeout.callbacks.append(lambda e: fired.append(e))
+    env.timeout(10)
+
+    assert env.is_scheduled("A")
+    timeout.cancel()
+    assert timeout.cancelled
+    assert not env.is_scheduled("A")
+    assert env.scheduled_agents == []
+
+    env.run()
+    assert env.now == 10
+    assert fired == []
+
+    with pytest.raises(RuntimeError):
+        env.event().cancel()
+
+
+def test_cancel_processed_event():
+
+    env = _simpy.Environment()
+    timeout = env.timeout(1)
+    env.run()
+
+    with pytest.raises(RuntimeError):
+        timeout.cancel()
+
+
+def test_cancelled_head_does_not_advance_time():
+
+    env = _simpy.Environment()
+    env.timeout(1).cancel()
+    env.timeout(3)
+
+    assert env.peek() == 3
+    env.step()
+    assert env.now == 3
+
+
+def test_queue_compaction():
+
+    env = _simpy.Environment()
+    timeouts = [env.timeout(i, agent=i) for i in range(100)]
+
+    for t in timeouts[:60]:
+        t.cancel()
+
+    assert len(env._queue) == 49
+    assert env._dead == 9
+    assert len(env.scheduled_agents) == 40
+
+    env.run()
+    assert env.now == 99
+
+
+def test_interrupted_target_can_be_yielded_again():
+
+    env = _simpy.Environment()
+    resumed = []
+
+    def sleeper(env):
+        timeout = env.timeout(10)
+        try:
+            yield timeout
+        except _simpy.Interrupt:
+            yield timeout
+
+        resumed.append(env.now)
+
+    def interrupter(env, proc):
+        yield env.timeout(3)
+        proc.interrupt()
+
+    proc = env.process(sleeper(env))
+    env.process(interrupter(env, proc))
+
+    env.run()
+    assert resumed == [10]
+    assert env.now == 10
+
+
+def test_cancel_interrupted_target():
+
+    env = _simpy.Environment()
+
+    def sleeper(env):
+        timeout = env.timeout(100, agent="Sleeper")
+        try:
+            yield timeout
+        except _simpy.Interrupt:
+            timeout.cancel()
+
+    def interrupter(env, proc):
+        yield env.timeout(1)
+        proc.interrupt()
+
+    proc = env.process(sleeper(env))
+    env.process(interrupter(env, proc))
+
+    env.run(until=2)
+    assert not env.is_scheduled("Sleeper")
+
+    env.run()
+    assert env.now == 2
+
+
+def test_all_of_value_lookup():
+
+    env = _simpy.Environment()
+    timeouts = [env.timeout(i, value=i) for i in range(1000)]
+    condition = env.all_of(timeouts)
+
+    value = env.run(until=condition)
+    assert env.now == 999
+    assert value._lookup is None
+    assert timeouts[10] in value
+    assert value._lookup is not None
+    assert list(value.values()) == list(range(1000))
+
+
+def test_any_of_value():
+
+    env = _simpy.Environment()
+    first = env.timeout(1, value="first")
+    second = env.timeout(2, value="second")
+
+    value = env.run(until=first | second)
+    assert env.now == 1
+
+    # Events processed after the condition are not part of its value.
+    env.run()
+    assert value == {first: "first"}
+    assert second not in value
+
+
+def test_nested_condition_value():
+
+    env = _simpy.Environment()
+    a = env.timeout(1, value="a")
+    b = env.timeout(2, value="b")
+    c = env.timeout(3, value="c")
+
+    value = env.run(until=(a & b) | c)
+    assert env.now == 2
+    assert value.todict() == {a: "a", b: "b"}
+
+
+def test_nested_condition_value_includes_all_processed_events():
+
+    env = _simpy.Environment()
+    a = env.timeout(1, value="a")
+    b = env.timeout(2, value="b")
+    c = env.timeout(3, value="c")
+
+    value = env.run(until=(a | b) & c)
+    assert env.now == 3
+    assert value.todict() == {a: "a", b: "b", c: "c"}
+    assert list(value) == [a, b, c]
+
+
+def test_custom_condition_evaluate():
+
+    env = _simpy.Environment()
+    timeouts = [env.timeout(i) for i in range(5)]
+    condition = _simpy.events.Condition(env, lambda events, count: count >= 3, timeouts)
+
+    env.run(until=condition)
+    assert env.now == 2
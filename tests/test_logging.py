@@ -6,7 +6,24 @@ __email__ = "jake.d.nunemaker@gmail.com"
 __status__ = "Development"
 
 
+import csv
+import json
+
+import numpy as np
+import pytest
+
 import _simpy
+from marmot import Environment
+from marmot.logs import (
+    CsvSink,
+    LogSink,
+    LogStore,
+    LogWriter,
+    LogArchive,
+    ArchiveSink,
+    JsonLinesSink,
+)
+from marmot.timeline import Timeline
 
 
 def test_single_agent_logging(env, ExampleAgent):
@@ -59,3 +76,336 @@ def test_multiple_agent_logging(env, ExampleAgent):
     assert agent1_actions[1]["time"] == 50
     assert agent1_actions[1]["action"] == "Perform"
     assert agent1_actions[1]["status"] == "Successful"
+
+
+def test_log_store_records(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+
+    agent.pause_then_perform(5, 10)
+    env.run()
+
+    store = env.log_store
+    records = store.records
+    assert np.shares_memory(records, store._data)
+    assert list(records["time"]) == [5, 5, 15]
+    assert store.agents == ["Test Agent"]
+    assert store.actions == ["Pause", "Perform"]
+    assert [store.levels[l] for l in records["level"]] == ["ACTION", "DEBUG", "ACTION"]
+
+    status = store.column("status")
+    assert list(status) == [None, "Starting", "Successful"]
+
+    assert env.logs[1] == {
+        "status": "Starting",
+        "agent": "Test Agent",
+        "level": "DEBUG",
+        "time": 5,
+    }
+    assert env.logs[-1] == {
+        "status": "Successful",
+        "agent": "Test Agent",
+        "action": "Perform",
+        "duration": 10,
+        "level": "ACTION",
+        "time": 15,
+    }
+
+
+def test_log_store_growth():
+
+    store = LogStore(capacity=2)
+    for i in range(10):
+        store.append(
+            {"agent": "A", "action": "Act", "duration": 1, "level": "ACTION", "time": i}
+        )
+
+    assert len(store) == 10
+    assert list(store.records["time"]) == list(range(10))
+    assert store.to_dicts([9])[0]["time"] == 9
+
+
+def test_indexed_log_queries(env, ExampleAgent):
+
+    agent1 = ExampleAgent("Agent 1")
+    agent2 = ExampleAgent("Agent 2")
+    env.register(agent1)
+    env.register(agent2)
+
+    agent1.pause_then_perform(5, 10)
+    agent2.pause_then_perform(10, 10)
+    env.run()
+
+    assert len(env.actions) == 4
+    assert all(l["level"] == "ACTION" for l in env.actions)
+
+    logs = env.logs_for(agent1)
+    assert len(logs) == 3
+    assert all(l["agent"] == "Agent 1" for l in logs)
+    assert env.logs_for("Unknown") == []
+
+    between = env.logs_between(5, 10)
+    assert [l["time"] for l in between] == [5, 5, 10, 10]
+    assert env.logs_between(11, 14) == []
+    assert len(env.logs_between(0, 20)) == len(env.logs)
+
+
+def test_log_sinks(tmp_path, state, ExampleAgent):
+
+    jsonl = tmp_path / "logs.jsonl"
+    csvfile = tmp_path / "logs.csv"
+
+    env = Environment(
+        state=state,
+        sinks=[JsonLinesSink(str(jsonl)), CsvSink(str(csvfile))],
+        retain_logs=False,
+        batch_size=2,
+        max_pending=1,
+    )
+
+    agent = ExampleAgent()
+    env.register(agent)
+    agent.pause_then_perform(5, 10)
+    env.run()
+
+    assert len(env.logs) == 0
+
+    lines = [json.loads(l) for l in jsonl.read_text().splitlines()]
+    assert len(lines) == 3
+    assert lines[-1]["action"] == "Perform"
+    assert lines[-1]["status"] == "Successful"
+
+    rows = list(csv.DictReader(csvfile.open()))
+    assert len(rows) == 3
+    assert rows[0]["action"] == "Pause"
+    assert rows[1]["level"] == "DEBUG"
+
+    env.close_logs()
+    assert not env._writer._thread.is_alive()
+
+
+def test_sink_error_does_not_hide_simulation_error(ExampleAgent):
+    class BrokenSink(LogSink):
+        def write(self, batch):
+            raise IOError("Disk full")
+
+    env = Environment(sinks=[BrokenSink()])
+    agent = ExampleAgent()
+    env.register(agent)
+
+    def failing(env):
+        yield env.timeout(2)
+        raise ValueError("Simulation failed")
+
+    agent.pause(1)
+    env.process(failing(env))
+    with pytest.raises(ValueError):
+        env.run()
+
+
+def test_log_writer_error():
+
+    class BrokenSink(LogSink):
+        def write(self, batch):
+            raise IOError("Disk full")
+
+    writer = LogWriter([BrokenSink()], batch_size=1)
+    writer.submit({"level": "DEBUG", "time": 0})
+
+    with pytest.raises(IOError):
+        writer.flush()
+
+    with pytest.raises(IOError):
+        writer.close()
+
+
+def test_log_level_threshold(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+
+    env.log_level = "ACTION"
+    assert not env.debug
+
+    agent.pause_then_perform(5, 10)
+    env.run()
+
+    assert len(env.logs) == 2
+    assert all(l["level"] == "ACTION" for l in env.logs)
+
+    with pytest.raises(ValueError):
+        env.log_level = "VERBOSE"
+
+
+def test_untracked_actions(env, ExampleAgent):
+
+    agent1 = ExampleAgent("Agent 1")
+    agent2 = ExampleAgent("Agent 2")
+    env.register(agent1)
+    env.register(agent2)
+
+    env.untrack(agent=agent1)
+    env.untrack(action="Pause")
+
+    agent1.pause_then_perform(5, 10)
+    agent2.pause_then_perform(5, 10)
+    env.run()
+
+    assert [(a["agent"], a["action"]) for a in env.actions] == [("Agent 2", "Perform")]
+
+    env.track(agent=agent1)
+    agent1.perform(5)
+    env.run()
+    assert env.actions[-1]["agent"] == "Agent 1"
+
+
+def test_track_agent_named_none(env, ExampleAgent):
+
+    agent = ExampleAgent("None")
+    env.register(agent)
+    env.untrack(agent=agent)
+    env.untrack(action="Pause")
+
+    # Tracking an action leaves the agent named 'None' untracked.
+    env.track(action="Pause")
+    agent.pause(5)
+    env.run()
+    assert env.actions == []
+
+    # Tracking without arguments resumes all agents and actions.
+    env.untrack(action="Pause")
+    env.track()
+    agent.pause(5)
+    env.run()
+    assert [(a["agent"], a["action"]) for a in env.actions] == [("None", "Pause")]
+
+
+def test_interned_categories(env, ExampleAgent):
+
+    agent1 = ExampleAgent("Agent 1")
+    agent2 = ExampleAgent("Agent 2")
+    env.register(agent1)
+    env.register(agent2)
+
+    assert env.categories["agent"] == ["Agent 1", "Agent 2"]
+    assert agent2._log_code == 1
+
+    agent2.pause(5)
+    env.run()
+
+    records = env.log_store.records
+    assert list(records["agent"]) == [1]
+    assert env.categories["action"][records["action"][0]] == "Pause"
+    assert env.categories["level"][records["level"][0]] == "ACTION"
+
+
+def test_renamed_agent_logs(env, ExampleAgent):
+
+    agent = ExampleAgent("Agent 1")
+    env.register(agent)
+
+    agent.pause(5)
+    env.run()
+
+    agent.name = "Agent 2"
+    agent.pause(5)
+    env.run()
+
+    assert [a["agent"] for a in env.actions] == ["Agent 1", "Agent 2"]
+
+
+def test_action_logs_use_overridden_hooks(ExampleAgent):
+    class StampedEnvironment(Environment):
+        def _timestamp_log(self, payload):
+            payload["time"] = self.now
+            payload["stamped"] = True
+            return payload
+
+    env = StampedEnvironment()
+    agent = ExampleAgent()
+    env.register(agent)
+
+    agent.pause(5)
+    env.run()
+
+    assert env.actions[-1]["stamped"]
+    assert env.actions[-1]["agent"] == str(agent)
+
+
+def test_action_logs_use_overridden_validation(ExampleAgent):
+    class StrictEnvironment(Environment):
+        def _validate_action(self, payload):
+            super()._validate_action(payload)
+            if payload["duration"] > 5:
+                raise ValueError("Action too long.")
+
+    env = StrictEnvironment()
+    agent = ExampleAgent()
+    env.register(agent)
+
+    agent.pause(5)
+    env.run()
+    agent.pause(10)
+    with pytest.raises(ValueError):
+        env.run()
+
+    trusted = StrictEnvironment(trusted_agents=True)
+    agent = ExampleAgent()
+    trusted.register(agent)
+    agent.pause(10)
+    trusted.run()
+    assert len(trusted.actions) == 1
+
+
+def test_log_archive(tmp_path, env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+    agent.pause_then_perform(5, 10)
+    env.run()
+
+    path = str(tmp_path / "logs.marmot")
+    env.save_logs(path)
+
+    archive = LogArchive(path)
+    assert isinstance(archive.records, np.memmap)
+    assert len(archive) == 3
+    assert list(archive.records["time"]) == [5, 5, 15]
+    assert list(archive.rows("level", "DEBUG")) == [1]
+    assert archive.to_dicts() == list(env.logs)
+    assert list(archive.between(10, 20)) == [2]
+
+    with pytest.raises(TypeError):
+        archive.append({"level": "DEBUG", "time": 0})
+
+    invalid = tmp_path / "invalid.marmot"
+    invalid.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        LogArchive(str(invalid))
+
+
+def test_concatenate_archives(tmp_path, state, ExampleAgent):
+
+    paths = []
+    for i, name in enumerate(["Agent 1", "Agent 2"]):
+        path = str(tmp_path / f"run{i}.marmot")
+        env = Environment(state=state, sinks=[ArchiveSink(path)])
+        agent = ExampleAgent(name)
+        env.register(agent)
+        agent.pause_then_perform(5, i + 1)
+        env.run()
+        env.close_logs()
+        paths.append(path)
+
+    archive = LogArchive.concatenate(paths, str(tmp_path / "all.marmot"))
+    assert len(archive) == 6
+    assert archive.agents == ["Agent 1", "Agent 2"]
+    assert [r[:2] for r in archive.runs] == [[0, 3], [3, 6]]
+    assert archive.runs[1][2] == paths[1]
+    assert list(archive.rows("agent", "Agent 2")) == [3, 4, 5]
+    assert list(archive.run(1)["duration"][[0, 2]]) == [5, 2]
+    assert list(archive.between(6, 7)) == [2, 5]
+
+    utilization = Timeline(archive).utilization()
+    assert utilization["Agent 2"] == 1.0
@@ -0,0 +1,219 @@
+"""Tests for the `_simpy.monitor` instruments."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2019, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import io
+
+import pytest
+
+import _simpy
+from _simpy.monitor import Sampler, Profiler, EventTrace, ResourceMonitor
+
+
+def test_step_hooks(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+
+    seen = []
+    hook = lambda entry, callbacks, elapsed: seen.append(entry)
+
+    env.add_step_hook(hook)
+    assert "step" in env.__dict__
+
+    agent.pause_then_perform(5, 10)
+    env.run()
+
+    assert env.now == 15
+    assert seen
+    assert all(entry[0] <= env.now for entry in seen)
+    assert seen[-1][0] == 15
+
+    env.remove_step_hook(hook)
+    assert "step" not in env.__dict__
+
+
+def test_profiler(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+
+    with Profiler(env) as profiler:
+        agent.pause_then_perform(5, 10)
+        env.run()
+
+    assert "step" not in env.__dict__
+    assert agent in profiler.agents
+    assert "Timeout" in profiler.event_types
+    assert "pause_then_perform" in {k.split(".")[-1] for k in profiler.processes}
+
+    count = sum(c for c, _ in profiler.event_types.values())
+    assert count == sum(c for c, _ in profiler.agents.values())
+
+    rows = profiler.top(profiler.agents)
+    assert rows == sorted(rows, key=lambda r: r[2], reverse=True)
+    assert "Agent" in profiler.report()
+
+
+def test_profiler_records_failing_event():
+
+    env = _simpy.Environment()
+    profiler = Profiler(env)
+
+    def failing(env):
+        yield env.timeout(1)
+        raise ValueError("Failure")
+
+    env.process(failing(env))
+    with pytest.raises(ValueError):
+        env.run()
+
+    assert profiler.event_types["Process"][0] == 1
+    profiler.stop()
+
+
+def test_event_trace_ring_buffer():
+
+    env = _simpy.Environment()
+    trace = EventTrace(env, capacity=5)
+
+    for i in range(10):
+        env.timeout(i, agent="Agent %d" % (i % 2))
+
+    env.run()
+    assert len(trace) == 5
+    assert trace.total == 10
+
+    records = trace.records()
+    assert list(records["time"]) == [5, 6, 7, 8, 9]
+    assert list(records["eid"]) == [5, 6, 7, 8, 9]
+    assert trace.event_types[records["type"][0]] == "Timeout"
+    assert trace.agents[records["agent"][-1]] == "Agent 1"
+
+    assert list(trace.records(2)["time"]) == [8, 9]
+
+
+def test_event_trace_dump_on_failure(env, ExampleAgent):
+
+    agent = ExampleAgent()
+    env.register(agent)
+    out = io.StringIO()
+    trace = EventTrace(env, capacity=100, dump=out)
+
+    def failing(env):
+        yield env.timeout(20)
+        raise ValueError("Failure")
+
+    agent.pause_then_perform(5, 10)
+    env.process(failing(env))
+
+    with pytest.raises(ValueError):
+        env.run()
+
+    text = out.getvalue()
+    assert "Last" in text
+    assert "Test Agent" in text
+    assert trace.records()["time"][-1] == 20
+
+
+def test_scheduler_counters():
+
+    env = _simpy.Environment()
+    timeouts = [env.timeout(i) for i in range(1, 11)]
+    timeouts[-1].cancel()
+
+    assert env.events_scheduled == 10
+    assert env.queue_depth == 9
+    assert env.peak_queue_depth == 10
+
+    env.run()
+    assert env.events_processed == 9
+    assert env.events_cancelled == 1
+    assert env.events_scheduled == 10
+    assert env.queue_depth == 0
+    assert env.events_per_time == 1.0
+    assert env.wall_time > 0
+    assert env.events_per_second > 0
+
+    stats = env.stats()
+    assert stats["now"] == 9
+    assert stats["peak_queue_depth"] == 10
+
+
+def test_sampler():
+
+    env = _simpy.Environment()
+    for i in range(100):
+        env.timeout(i)
+
+    depths = []
+    sampler = Sampler(env, 10, callback=lambda s: depths.append(s["queue_depth"]))
+    env.run()
+
+    assert [s["now"] for s in sampler.samples] == list(range(0, 100, 10))
+    assert depths[0] == 99
+    assert depths == sorted(depths, reverse=True)
+
+    sampler.stop()
+    assert "step" not in env.__dict__
+
+
+def test_resource_monitor():
+
+    env = _simpy.Environment()
+    resource = _simpy.Resource(env, capacity=2)
+    monitor = ResourceMonitor(resource, record=10)
+
+    def user(duration):
+        with resource.request() as req:
+            yield req
+            yield env.timeout(duration)
+
+    for duration in (4, 4, 2):
+        env.process(user(duration))
+
+    env.run()
+    stats = monitor.stats()
+    assert env.now == 6
+    assert stats["level"] == pytest.approx(10 / 6)
+    assert stats["utilization"] == pytest.approx(10 / 12)
+    assert stats["put_queue"] == pytest.approx(4 / 6)
+    assert stats["max_level"] == 2
+    assert stats["max_put_queue"] == 1
+
+    records = monitor.records()
+    assert records["time"].tolist() == [0, 4, 6]
+    assert records["level"].tolist() == [2, 1, 0]
+    assert records["put_queue"].tolist() == [1, 0, 0]
+
+    with pytest.raises(RuntimeError):
+        ResourceMonitor(resource)
+
+    monitor.stop()
+    assert resource._monitor is None
+
+
+def test_container_monitor():
+
+    env = _simpy.Environment()
+    tank = _simpy.Container(env, capacity=10)
+    monitor = ResourceMonitor(tank, record=1)
+
+    def refuel():
+        yield env.timeout(5)
+        yield tank.put(10)
+
+    tank.get(5)
+    env.process(refuel())
+    env.run(until=10)
+
+    stats = monitor.stats()
+    assert stats["level"] == 2.5
+    assert stats["get_queue"] == 0.5
+    assert stats["utilization"] == 0.25
+    assert len(monitor) == 1
+    assert monitor.dropped == 2
@@ -0,0 +1,677 @@
+"""Tests for `marmot.resources` and the modifications to `_simpy` resources."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2019, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import random
+
+import pytest
+
+import _simpy
+from marmot import Environment, GatedResource, lt
+from _simpy.resources.base import EventQueue
+from _simpy.resources.resource import SortedQueue
+
+
+def test_priority_resource_order_10k():
+
+    env = _simpy.Environment()
+    resource = _simpy.PriorityResource(env, capacity=1)
+    random.seed(0)
+    served = []
+
+    def user(i, priority):
+        with resource.request(priority=priority) as req:
+            yield req
+            served.append((priority, i))
+            yield env.timeout(1)
+
+    priorities = [random.randint(0, 100) for _ in range(10000)]
+    for i, p in enumerate(priorities):
+        env.process(user(i, p))
+
+    env.run()
+    assert served[0] == (priorities[0], 0)
+    assert served[1:] == sorted(served[1:])
+    assert env.now == 10000
+
+
+def test_sorted_queue():
+
+    class Item:
+        def __init__(self, key):
+            self.key = key
+
+    queue = SortedQueue(maxlen=4)
+    a, b, c, d = Item((1, 0)), Item((0, 0)), Item((1, 0)), Item((0, 1))
+    for item in (a, b, c, d):
+        queue.append(item)
+
+    assert list(queue) == [b, d, a, c]
+    with pytest.raises(RuntimeError):
+        queue.append(Item((0, 0)))
+
+    queue.remove(c)
+    assert queue.pop(0) is b
+    assert list(queue) == [d, a]
+    assert queue._keys == [d.key, a.key]
+
+    with pytest.raises(ValueError):
+        queue.remove(c)
+
+
+def test_event_queue_cancel():
+
+    env = _simpy.Environment()
+    resource = _simpy.Resource(env, capacity=1)
+    assert isinstance(resource.queue, EventQueue)
+
+    first = resource.request()
+    waiting = [resource.request() for _ in range(3)]
+    waiting[1].cancel()
+    assert list(resource.queue) == [waiting[0], waiting[2]]
+
+    resource.release(first)
+    env.run()
+    assert list(resource.users) == [waiting[0]]
+    assert list(resource.queue) == [waiting[2]]
+
+
+def test_event_queue_pop():
+
+    queue = EventQueue([1, 2, 3, 4])
+    assert queue.pop(0) == 1
+    assert queue.pop() == 4
+    queue.append(5)
+    assert queue.pop(1) == 3
+    assert list(queue) == [2, 5]
+
+
+def test_keyed_store():
+
+    env = _simpy.Environment()
+    store = _simpy.KeyedStore(env, key=lambda item: item[0])
+    received = []
+
+    def getter(name, *keys):
+        item = yield store.get(*keys)
+        received.append((name, env.now, item))
+
+    def putter():
+        yield env.timeout(1)
+        yield store.put(("blade", 1))
+        yield store.put(("tower", 1))
+        yield env.timeout(1)
+        yield store.put(("blade", 2))
+        yield store.put(("nacelle", 1), key="other")
+
+    env.process(getter("A", "tower"))
+    env.process(getter("B", "blade", "tower"))
+    env.process(getter("C", "blade"))
+    env.process(putter())
+    env.run()
+
+    assert received == [
+        ("B", 1, ("blade", 1)),
+        ("A", 1, ("tower", 1)),
+        ("C", 2, ("blade", 2)),
+    ]
+    assert store.items == [("nacelle", 1)]
+    assert store.count("other") == 1
+    assert len(store.get_queue) == 0
+
+
+def test_keyed_store_oldest_item_and_cancel():
+
+    env = _simpy.Environment()
+    store = _simpy.KeyedStore(env)
+    for item in ("b", "a", "b"):
+        store.put(item)
+
+    env.run()
+    assert store.get("a", "b").value == "b"
+
+    pending = store.get("c")
+    pending.cancel()
+    store.put("c")
+    env.run()
+    assert store.items == ["a", "b", "c"]
+
+    with pytest.raises(ValueError):
+        store.get()
+
+
+def test_keyed_store_index_does_not_grow():
+
+    env = _simpy.Environment()
+    store = _simpy.KeyedStore(env)
+
+    for i in range(1000):
+        get = store.get("a", "b", "c")
+        if i % 2:
+            get.cancel()
+        else:
+            store.put("b" if i % 4 else "a")
+            env.run()
+            assert get.triggered
+
+    assert len(store.get_queue) == 0
+    assert store.get_queue._index == {}
+
+
+def test_user_set_release():
+
+    env = _simpy.Environment()
+    resource = _simpy.Resource(env, capacity=200)
+    requests = [resource.request() for _ in range(200)]
+    assert len(resource.users) == 200
+
+    resource.release(requests[100])
+    resource.release(requests[100])
+    env.run()
+    assert len(resource.users) == 199
+    assert requests[100] not in resource.users
+    assert resource.users[100] is requests[101]
+
+
+def test_preemption_victim():
+
+    env = _simpy.Environment()
+    resource = _simpy.PreemptiveResource(env, capacity=3)
+    preempted = []
+
+    def user(name, priority, duration):
+        with resource.request(priority=priority) as req:
+            yield req
+            try:
+                yield env.timeout(duration)
+            except _simpy.Interrupt as interrupt:
+                preempted.append((name, env.now, interrupt.cause.by))
+
+    env.process(user("A", 2, 10))
+    env.process(user("B", 5, 10))
+    env.process(user("C", 5, 10))
+    env.run(until=1)
+    env.process(user("D", 1, 10))
+    env.run(until=2)
+    by = env.process(user("E", 3, 10))
+    env.process(user("F", 6, 10))
+    env.run()
+
+    assert [(name, t) for name, t, _ in preempted] == [("C", 1), ("B", 2)]
+    assert preempted[1][2] is by
+    assert len(resource._victims) <= 2 * len(resource.users)
+
+
+def test_gated_resource(env):
+
+    port = GatedResource(env, {"temp": lt(100)}, capacity=2)
+    assert port.is_open
+    granted = []
+
+    def vessel(name, arrival, duration):
+        yield env.timeout(arrival)
+        with port.request() as req:
+            yield req
+            granted.append((name, env.now))
+            yield env.timeout(duration)
+
+    env.process(vessel("A", 11, 4))
+    env.process(vessel("B", 13, 1))
+    env.process(vessel("C", 14, 1))
+    env.run(until=13)
+    assert not port.is_open
+    assert port.next_opening() == 18
+
+    env.run()
+    assert granted == [("A", 11), ("B", 18), ("C", 18)]
+    assert env.now == 19
+
+
+def test_gated_resource_withdraws_opening(env):
+
+    port = GatedResource(env, {"temp": lt(100)})
+    env.run(until=13)
+
+    held = port.request()
+    assert port._opening is not None
+    held.cancel()
+    assert port._opening is None
+    env.run()
+    assert env.now == 13
+
+    # Replacing the state reschedules the opening and grants the requests
+    # if the resource is open now.
+    held = port.request()
+    state = env._state.copy()
+    state["temp"][14:16] = 0
+    env.state = state
+    assert port.next_opening() == 14
+    env.run()
+    assert held.triggered
+    assert env.now == 14
+
+    port.release(held)
+    env.run(until=16)
+    closed = port.request()
+    assert not closed.triggered
+
+    state = state.copy()
+    state["temp"][:] = 0
+    env.state = state
+    assert closed.triggered
+    assert port._opening is None
+
+
+def test_gated_resource_without_state(min_env):
+
+    port = GatedResource(min_env, {"temp": lt(70)})
+    assert port.is_open
+    assert port.request().triggered
+
+
+def test_multi_request():
+
+    env = _simpy.Environment()
+    berth = _simpy.Resource(env, capacity=1)
+    crane = _simpy.PriorityResource(env, capacity=1)
+    crew = _simpy.Resource(env, capacity=2)
+    log = []
+
+    def vessel(name, arrival, duration, priority):
+        yield env.timeout(arrival)
+        with _simpy.MultiRequest([berth, crane, crew], priority=priority) as req:
+            requests = yield req
+            assert [r.resource for r in requests] == [berth, crane, crew]
+            log.append((name, env.now))
+            yield env.timeout(duration)
+
+    def crane_service():
+        yield env.timeout(1)
+        with crane.request() as req:
+            yield req
+            log.append(("service", env.now))
+            yield env.timeout(6)
+
+    env.process(vessel("A", 0, 5, 2))
+    env.process(crane_service())
+    env.process(vessel("B", 1, 2, 2))
+    env.process(vessel("C", 2, 2, 1))
+    env.run(until=3)
+
+    # A holds berth, crane and crew. B and C hold nothing while waiting.
+    assert crew.count == 1
+    env.run()
+
+    assert log == [("A", 0), ("service", 5), ("C", 11), ("B", 13)]
+    assert crew.count == berth.count == crane.count == 0
+
+
+def test_multi_request_cancel_and_agent():
+
+    env = _simpy.Environment()
+    berth, crane = _simpy.Resource(env), _simpy.Resource(env)
+    first = _simpy.MultiRequest([berth, crane])
+    assert first.triggered
+
+    waiting = _simpy.MultiRequest([berth, crane], agent="vessel")
+    assert env.is_scheduled("vessel")
+    waiting.cancel()
+    assert not env.is_scheduled("vessel")
+
+    second = _simpy.MultiRequest([crane], agent="crew")
+    first.release()
+    env.run()
+    assert not waiting.triggered
+    assert second.triggered
+    assert list(crane.users) == second.requests
+
+
+def test_multi_request_reserves_released_slots():
+
+    env = _simpy.Environment()
+    quay = _simpy.PriorityResource(env, capacity=1)
+    vessel_crew = _simpy.Resource(env, capacity=1)
+    log = []
+
+    def user(name, arrival, priority=0):
+        yield env.timeout(arrival)
+        with quay.request(priority=priority) as req:
+            yield req
+            log.append((name, env.now))
+            yield env.timeout(2)
+
+    def vessel():
+        yield env.timeout(0.5)
+        with _simpy.MultiRequest([quay, vessel_crew], priority=0) as req:
+            yield req
+            log.append(("vessel", env.now))
+            yield env.timeout(2)
+
+    env.process(user("first", 0))
+    env.process(vessel())
+    for i in range(1, 5):
+        env.process(user(f"crane {i}", i))
+    env.process(user("urgent", 3, priority=-1))
+    env.run()
+
+    # The vessel outranks the later crane requests, but not the request with
+    # a better priority.
+    assert log == [
+        ("first", 0),
+        ("vessel", 2),
+        ("urgent", 4),
+        ("crane 1", 6),
+        ("crane 2", 8),
+        ("crane 3", 10),
+        ("crane 4", 12),
+    ]
+
+
+def test_multi_request_reservation_blocks_free_slots():
+
+    env = _simpy.Environment()
+    berth, crane = _simpy.Resource(env), _simpy.Resource(env)
+    busy = crane.request()
+
+    waiting = _simpy.MultiRequest([berth, crane])
+    env.run(until=1)
+    later = berth.request()
+    assert not waiting.triggered
+    assert not later.triggered
+    assert berth.count == 0
+
+    crane.release(busy)
+    env.run()
+    assert waiting.triggered
+    assert not later.triggered
+
+    waiting.release()
+    env.run()
+    assert later.triggered
+
+    # Withdrawing a waiting request lifts its reservation.
+    busy = crane.request()
+    waiting = _simpy.MultiRequest([berth, crane])
+    env.run(until=2)
+    blocked = berth.request()
+    berth.release(later)
+    env.run()
+    assert not blocked.triggered
+    waiting.cancel()
+    assert blocked.triggered
+
+
+def test_multi_request_grants_all_freed_slots():
+
+    env = _simpy.Environment()
+    berth, crane = _simpy.Resource(env, capacity=3), _simpy.Resource(env)
+    busy = crane.request()
+
+    def release():
+        yield env.timeout(10)
+        crane.release(busy)
+
+    def user():
+        yield env.timeout(1)
+        with berth.request() as req:
+            yield req
+            log.append(env.now)
+            yield env.timeout(5)
+
+    log = []
+    waiting = _simpy.MultiRequest([berth, crane])
+    env.process(release())
+    env.process(user())
+    env.process(user())
+    env.run()
+
+    # Lifting the reservation grants every request that fits.
+    assert waiting.triggered
+    assert log == [10, 10]
+
+
+def test_multi_request_many_grants():
+
+    env = _simpy.Environment()
+    berth = _simpy.Resource(env, capacity=1000)
+    crane = _simpy.Resource(env, capacity=1000)
+    busy = [crane.request() for _ in range(1000)]
+    waiting = [_simpy.MultiRequest([berth, crane]) for _ in range(500)]
+
+    for req in busy:
+        crane.release(req)
+    env.run()
+
+    assert all(req.triggered for req in waiting)
+    assert berth.count == crane.count == 500
+
+
+def test_multi_request_duplicate_resources():
+
+    env = _simpy.Environment()
+    berth = _simpy.Resource(env, capacity=2)
+    with pytest.raises(ValueError):
+        _simpy.MultiRequest([berth, berth])
+
+
+def test_store_put_many_get_many():
+
+    env = _simpy.Environment()
+    store = _simpy.Store(env, capacity=150)
+    gets = [store.get() for _ in range(3)]
+    many = store.get_many(100)
+
+    put = store.put_many(range(120))
+    assert put.triggered
+    env.run()
+
+    assert [get.value for get in gets] == [0, 1, 2]
+    assert many.value == list(range(3, 103))
+    assert store.items == list(range(103, 120))
+
+    blocked = store.put_many(range(150))
+    assert not blocked.triggered
+    assert len(store.get_many(17).value) == 17
+    env.run()
+    assert blocked.triggered
+    assert len(store.items) == 150
+
+    priority = _simpy.PriorityStore(env)
+    priority.put_many([5, 1, 3])
+    assert priority.get_many(2).value == [1, 3]
+
+
+def test_container_partial():
+
+    env = _simpy.Environment()
+    tank = _simpy.Container(env, capacity=10, init=4)
+    done = []
+
+    def vessel():
+        get = tank.get(25, partial=True)
+        yield env.timeout(1)
+        assert get.filled == 4
+        yield get
+        done.append(("vessel", env.now))
+
+    def tanker():
+        for _ in range(3):
+            yield env.timeout(2)
+            yield tank.put(9, partial=True)
+            done.append(("tanker", env.now))
+
+    env.process(vessel())
+    env.process(tanker())
+    env.run()
+
+    assert done == [("tanker", 2), ("tanker", 4), ("tanker", 6), ("vessel", 6)]
+    assert tank.level == 6
+
+    put = tank.put(8, partial=True)
+    assert put.filled == 4
+    tank.get(10)
+    env.run()
+    assert put.triggered
+    assert tank.level == 4
+
+
+def test_store_single_requests_unchanged_by_batches():
+
+    env = _simpy.Environment()
+    store = _simpy.Store(env, capacity=2)
+    store.put("a"), store.put("b")
+    first, second = store.put("c"), store.put("d")
+    get = store.get()
+    store.get()
+    env.run(until=get)
+
+    # Each processed single request serves one request of the other queue.
+    assert first.triggered
+    assert not second.triggered
+    env.run()
+    assert second.triggered
+    assert store.items == ["c", "d"]
+
+
+def test_batch_requests_exceeding_capacity():
+
+    env = _simpy.Environment()
+    store = _simpy.Store(env, capacity=3)
+    with pytest.raises(ValueError):
+        store.put_many(range(4))
+    with pytest.raises(ValueError):
+        store.get_many(4)
+
+    array = _simpy.ArrayStore(env, capacity=3)
+    with pytest.raises(ValueError):
+        array.put_many(range(4))
+    with pytest.raises(ValueError):
+        array.get_many(4)
+
+
+def test_container_cancel_partial():
+
+    env = _simpy.Environment()
+    tank = _simpy.Container(env, capacity=10, init=3)
+
+    # Cancelling puts the matter back, which serves the waiting requests.
+    get = tank.get(10, partial=True)
+    waiting = tank.get(2)
+    assert tank.level == 0
+    get.cancel()
+    assert get.filled == 0
+    assert waiting.triggered
+    assert tank.level == 1
+
+    # Matter that has already been taken out again is not returned.
+    put = tank.put(20, partial=True)
+    assert put.filled == 9
+    tank.get(8)
+    env.run()
+    assert put.filled == 17
+    put.cancel()
+    assert tank.level == 0
+    assert put.filled == 7
+
+    # Matter is only put back as far as there is space for it.
+    tank.put(10)
+    get = tank.get(12, partial=True)
+    assert get.filled == 10
+    tank.put(4)
+    get.cancel()
+    assert tank.level == 10
+    assert get.filled == 4
+
+
+def test_array_store_fifo():
+
+    env = _simpy.Environment()
+    store = _simpy.ArrayStore(env, capacity=4, dtype="i8")
+    store.put_many([1, 2, 3])
+    assert store.get().value == 1
+    store.put_many([4, 5])
+    assert store.items.tolist() == [2, 3, 4, 5]
+
+    blocked = store.put(6)
+    assert not blocked.triggered
+    assert store.get_many(3).value.tolist() == [2, 3, 4]
+    env.run()
+
+    assert blocked.triggered
+    assert store.items.tolist() == [5, 6]
+    assert len(store) == 2
+
+
+def test_array_store_rejects_invalid_items():
+
+    env = _simpy.Environment()
+    for priority in (False, True):
+        store = _simpy.ArrayStore(env, capacity=4, priority=priority)
+        with pytest.raises(ValueError):
+            store.put("abc")
+        with pytest.raises(ValueError):
+            store.put([1.0, 2.0])
+        with pytest.raises(ValueError):
+            store.put_many(["abc", 1.0])
+
+        assert len(store) == 0
+        assert not store.put_queue
+        assert store.put(2.0).triggered
+        assert store.put_many([1.0, 3.0]).triggered
+        assert store.items.tolist() == (
+            [1.0, 2.0, 3.0] if priority else [2.0, 1.0, 3.0]
+        )
+
+
+def test_array_store_priority():
+
+    env = _simpy.Environment()
+    random.seed(1)
+    values = [random.random() for _ in range(100)]
+
+    store = _simpy.ArrayStore(env, capacity=100, priority=True)
+    for v in values[:50]:
+        store.put(v)
+    store.put_many(values[50:])
+
+    assert store.items.tolist() == sorted(values)
+    assert [store.get().value for _ in range(10)] == sorted(values)[:10]
+    assert store.get_many(5).value.tolist() == sorted(values)[10:15]
+    assert store.get().value == sorted(values)[15]
+
+    dtype = [("priority", "i4"), ("turbine", "i4")]
+    records = _simpy.ArrayStore(
+        env, capacity=3, dtype=dtype, priority=True, key="priority"
+    )
+    for record in [(2, 10), (0, 11), (1, 12)]:
+        records.put(record)
+    assert records.get().value["turbine"] == 11
+    assert records.items["turbine"].tolist() == [12, 10]
+
+    with pytest.raises(ValueError):
+        _simpy.ArrayStore(env, capacity=3, dtype=dtype, priority=True)
+
+
+def test_array_store_priority_ties():
+
+    env = _simpy.Environment()
+    dtype = [("priority", "i4"), ("turbine", "i4")]
+    store = _simpy.ArrayStore(
+        env, capacity=20, dtype=dtype, priority=True, key="priority"
+    )
+    for turbine in range(8):
+        store.put((turbine % 2, turbine))
+    store.put_many([(0, 8), (1, 9)])
+    for turbine in range(10, 12):
+        store.put((0, turbine))
+
+    # Items with equal keys are retrieved in the order they were put.
+    expected = [0, 2, 4, 6, 8, 10, 11, 1, 3, 5, 7, 9]
+    assert store.items["turbine"].tolist() == expected
+    assert [store.get().value["turbine"] for _ in range(3)] == expected[:3]
+    assert store.get_many(5).value["turbine"].tolist() == expected[3:8]
+    assert [store.get().value["turbine"] for _ in range(4)] == expected[8:]
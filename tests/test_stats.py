@@ -0,0 +1,63 @@
+"""Tests for the `marmot.stats` aggregators."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+from marmot import Environment, gt
+from marmot.stats import ActionStats, AgentSummary
+
+
+def test_action_stats(env, ExampleAgent):
+
+    agent1 = ExampleAgent("Agent 1")
+    agent2 = ExampleAgent("Agent 2")
+    env.register(agent1)
+    env.register(agent2)
+
+    stats = env.add_aggregator(ActionStats())
+    by_action = env.add_aggregator(ActionStats(by="action"))
+
+    agent1.pause_then_perform(5, 10)
+    agent2.pause_then_perform(10, 20)
+    env.run()
+
+    results = stats.results()
+    assert results[("Agent 1", "Pause")]["total"] == 5
+    assert results[("Agent 2", "Perform")]["count"] == 1
+
+    results = by_action.results()
+    assert results["Perform"] == {
+        "count": 2,
+        "total": 30,
+        "mean": 15,
+        "min": 10,
+        "max": 20,
+    }
+
+
+def test_agent_summary_without_retained_logs(state, ExampleAgent):
+
+    env = Environment(state=state, retain_logs=False)
+    agent = ExampleAgent()
+    env.register(agent)
+
+    summary = env.add_aggregator(AgentSummary())
+    agent.task("Task", 2, constraints={"temp": gt(66)})
+    env.run()
+    agent.task("Task", 2, constraints={"temp": gt(66)})
+    env.run()
+
+    assert len(env.logs) == 0
+    results = summary.results()["Test Agent"]
+    assert results["count"] == 3
+    assert results["working"] == 4
+    assert results["delay"] == 2
+    assert results["total"] == env.now
+
+    env.remove_aggregator(summary)
+    agent.pause(1)
+    env.run()
+    assert summary.results()["Test Agent"]["count"] == 3
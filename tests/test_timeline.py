@@ -0,0 +1,84 @@
+"""Tests for the `marmot.timeline` module."""
+
+__author__ = "Jake Nunemaker"
+__copyright__ = "Copyright 2020, Jake Nunemaker"
+__email__ = "jake.d.nunemaker@gmail.com"
+__status__ = "Development"
+
+
+import numpy as np
+import pytest
+
+from marmot import true
+from marmot.logs import LogStore
+from marmot.timeline import Timeline
+
+
+def test_agent_intervals(env, ExampleAgent):
+
+    agent1 = ExampleAgent("Agent 1")
+    agent2 = ExampleAgent("Agent 2")
+    env.register(agent1)
+    env.register(agent2)
+
+    agent1.pause_then_perform(5, 10)
+    agent2.task("Work", 4, constraints={"workday": true()})
+    env.run()
+
+    timeline = env.timeline()
+    intervals = timeline.intervals(agent1)
+    assert list(intervals["start"]) == [0, 5]
+    assert list(intervals["end"]) == [5, 15]
+    assert list(intervals["action"]) == ["Pause", "Perform"]
+
+    intervals = timeline.intervals("Agent 2")
+    assert list(intervals["action"]) == ["Delay", "Work"]
+
+    with pytest.raises(KeyError):
+        timeline.intervals("Agent 3")
+
+    utilization = timeline.utilization()
+    assert utilization["Agent 1"] == 1.0
+    assert utilization["Agent 2"] == 4 / 15
+    assert timeline.utilization(include_delays=True)["Agent 2"] == 10 / 15
+
+
+def test_concurrency():
+
+    store = LogStore()
+    for agent, end, duration in [("A", 5, 5), ("B", 7, 4), ("C", 10, 5), ("A", 12, 2)]:
+        store.append(
+            {
+                "agent": agent,
+                "action": "Work",
+                "duration": duration,
+                "level": "ACTION",
+                "time": end,
+            }
+        )
+
+    times, counts = Timeline(store).concurrency()
+    assert list(times) == [0, 3, 5, 7, 10, 12]
+    assert list(counts) == [1, 2, 2, 1, 1, 0]
+
+
+def test_large_timeline():
+
+    n = 1000000
+    store = LogStore(capacity=n)
+    rng = np.random.default_rng(1)
+    data = store._data
+    data["time"] = np.sort(rng.uniform(0, 1e6, n))
+    data["duration"] = rng.uniform(0, 10, n)
+    data["agent"] = rng.integers(0, 100, n)
+    data["action"] = 0
+    data["level"] = 0
+    store._size = n
+    store.agents.extend(str(i) for i in range(100))
+    store.actions.append("Work")
+
+    timeline = Timeline(store)
+    assert len(timeline) == n
+    assert len(timeline.utilization()) == 100
+    times, counts = timeline.concurrency()
+    assert counts[-1] == 0